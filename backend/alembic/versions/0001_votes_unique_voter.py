@@ -0,0 +1,46 @@
+"""One vote per voter per election, and an index for per-candidate counts
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Tables themselves are created by ``Base.metadata.create_all`` on startup, which
+already includes these on a fresh database, so each step checks first.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    duplicates = bind.execute(sa.text(
+        "SELECT election_id, voter_id FROM votes "
+        "GROUP BY election_id, voter_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        raise RuntimeError(
+            f"{len(duplicates)} voters have more than one vote in an election; "
+            "resolve them before adding the unique constraint"
+        )
+
+    constraints = {c["name"] for c in inspector.get_unique_constraints("votes")}
+    if "uq_votes_election_voter" not in constraints:
+        with op.batch_alter_table("votes") as batch_op:
+            batch_op.create_unique_constraint("uq_votes_election_voter", ["election_id", "voter_id"])
+
+    indexes = {i["name"] for i in inspector.get_indexes("votes")}
+    if "ix_votes_election_candidate" not in indexes:
+        op.create_index("ix_votes_election_candidate", "votes", ["election_id", "candidate_id"])
+
+
+def downgrade():
+    op.drop_index("ix_votes_election_candidate", table_name="votes")
+    with op.batch_alter_table("votes") as batch_op:
+        batch_op.drop_constraint("uq_votes_election_voter", type_="unique")
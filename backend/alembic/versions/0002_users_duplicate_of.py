@@ -0,0 +1,35 @@
+"""Record which earlier account a user's face duplicates
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+A fresh database already gets the column from ``Base.metadata.create_all``,
+so each step checks first.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    columns = {c["name"] for c in inspector.get_columns("users")}
+    if "duplicate_of" not in columns:
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.add_column(sa.Column("duplicate_of", sa.String(6), nullable=True))
+
+    indexes = {i["name"] for i in inspector.get_indexes("users")}
+    if "ix_users_duplicate_of" not in indexes:
+        op.create_index("ix_users_duplicate_of", "users", ["duplicate_of"])
+
+
+def downgrade():
+    op.drop_index("ix_users_duplicate_of", table_name="users")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("duplicate_of")
@@ -0,0 +1,45 @@
+"""Stamp when each user's face encoding was last written
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Faces enrolled before this revision are stamped with the time of the upgrade.
+A fresh database already gets the column from ``Base.metadata.create_all``,
+so each step checks first.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    columns = {c["name"] for c in inspector.get_columns("users")}
+    if "face_enrolled_at" not in columns:
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.add_column(sa.Column("face_enrolled_at", sa.DateTime(), nullable=True))
+
+    indexes = {i["name"] for i in inspector.get_indexes("users")}
+    if "ix_users_face_enrolled_at" not in indexes:
+        op.create_index("ix_users_face_enrolled_at", "users", ["face_enrolled_at"])
+
+    op.execute(
+        sa.text(
+            "UPDATE users SET face_enrolled_at = :now "
+            "WHERE face_encoding IS NOT NULL AND face_enrolled_at IS NULL"
+        ).bindparams(now=datetime.utcnow())
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_face_enrolled_at", table_name="users")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("face_enrolled_at")
@@ -0,0 +1,49 @@
+"""Keep the read cache version in its own table
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+The version used to be the ``read_cache`` row of ``id_sequences``, the ID
+allocator's table. It moves to the single row of ``read_cache_version``. A
+fresh database already gets the table and its row from
+``Base.metadata.create_all``, so each step checks first.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "read_cache_version" not in inspector.get_table_names():
+        op.create_table(
+            "read_cache_version",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("version", sa.BigInteger(), nullable=False),
+        )
+
+    if bind.execute(sa.text("SELECT COUNT(*) FROM read_cache_version")).scalar() == 0:
+        op.execute("INSERT INTO read_cache_version (id, version) VALUES (1, 0)")
+
+    if "id_sequences" in inspector.get_table_names():
+        legacy = bind.execute(sa.text("SELECT next_value FROM id_sequences WHERE name = 'read_cache'")).scalar()
+        if legacy:
+            op.execute(sa.text(
+                "UPDATE read_cache_version SET version = :legacy WHERE id = 1 AND version < :legacy"
+            ).bindparams(legacy=legacy))
+        op.execute("DELETE FROM id_sequences WHERE name = 'read_cache'")
+
+
+def downgrade():
+    version = op.get_bind().execute(sa.text("SELECT version FROM read_cache_version WHERE id = 1")).scalar()
+    if version:
+        op.execute(sa.text("INSERT INTO id_sequences (name, next_value) VALUES ('read_cache', :version)").bindparams(
+            version=version))
+    op.drop_table("read_cache_version")
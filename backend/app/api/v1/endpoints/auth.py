@@ -1,19 +1,19 @@
 from typing import Optional
-from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import EmailStr
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 import base64
-import numpy as np
 import face_recognition
 
 from app.core.token import create_access_token
-from app.db import models, schemas
+from app.db import schemas
 from app.db.database import get_db
-from app.services import user_service, face_recognition_service
-from app.utils.auth_utils import get_current_user
+from app.services import user_service, face_recognition_service, face_pipeline, vote_token_service
+from app.utils.auth_utils import get_current_user, get_current_user_async
+from app.utils.face_encoding import deserialize_encoding
 
 router = APIRouter()
 
@@ -37,7 +37,7 @@ def login_user(login_data: schemas.LoginInput, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=schemas.UserInfo)
-def read_current_user(current_user: models.User = Depends(get_current_user)):
+async def read_current_user(current_user: schemas.CurrentUser = Depends(get_current_user_async)):
     """Get current user"""
     return current_user
 
@@ -54,7 +54,7 @@ def register_with_face(
         HTTPBearer(auto_error=False)),
 ):
     """Register a new user with face data or add face data to an existing user"""
-    current_user: Optional[models.User] = None
+    current_user: Optional[schemas.CurrentUser] = None
     if token:
         try:
             current_user = get_current_user(token=token, db=db)
@@ -63,10 +63,12 @@ def register_with_face(
                 raise
 
     if current_user:
-        if current_user.face_encoding:
+        # The cached principal may predate an enrollment made on another worker
+        user = user_service.get_user_by_id(db, current_user.user_id)
+        if user.face_encoding is not None:
             raise HTTPException(
                 status_code=400, detail="Face data already registered for this user")
-        return user_service.add_face_data_to_user(db, current_user, image)
+        return user_service.add_face_data_to_user(db, user, image)
     else:
         if not email or not full_name or not password:
             raise HTTPException(
@@ -99,30 +101,30 @@ def login_with_face(
     return {"access_token": token, "token_type": "bearer"}
 
 
-@router.post("/face/verify")
+@router.post("/face/verify", response_model=schemas.FaceVerificationResult)
 async def verify_face(
     image: UploadFile = File(...),
+    election_id: str = Form(...),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
-    """Verify user's face before voting"""
-    if not current_user.face_encoding:
+    """Verify user's face before voting and issue a single-use vote token"""
+    if not current_user.has_face:
         raise HTTPException(
             status_code=400,
             detail="Face data not registered. Please register your face first."
         )
 
-    image_data = face_recognition.load_image_file(image.file)
-    encodings = face_recognition.face_encodings(image_data)
-    if not encodings:
+    input_encoding = await face_pipeline.encode_upload_async(image, "verify")
+    if input_encoding is None:
         raise HTTPException(
             status_code=400,
             detail="No face found in the image"
         )
 
-    input_encoding = encodings[0]
-    stored_encoding = np.frombuffer(
-        current_user.face_encoding, dtype=np.float64)
+    # The session is synchronous, so keep its query off the event loop
+    stored_encoding = deserialize_encoding(
+        await run_in_threadpool(user_service.get_face_encoding, db, current_user.user_id))
 
     results = face_recognition.compare_faces(
         [stored_encoding], input_encoding, tolerance=0.6)
@@ -133,26 +135,18 @@ async def verify_face(
             detail="Face verification failed"
         )
 
-    try:
-        verification_session = models.FaceVerificationSession(
-            user_id=current_user.user_id,
-            expires_at=datetime.utcnow() + timedelta(minutes=5)
-        )
-        db.add(verification_session)
-        db.commit()
-
-        return {"message": "Face verification successful"}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to create verification session: {str(e)}"
-        )
+    vote_token, expires_at = vote_token_service.issue(current_user.user_id, election_id)
+    return {
+        "message": "Face verification successful",
+        "vote_token": vote_token,
+        "expires_at": expires_at,
+        "election_id": election_id,
+    }
 
 
 @router.get("/face-status", response_model=dict)
-async def get_face_status(current_user: models.User = Depends(get_current_user)):
+async def get_face_status(current_user: schemas.CurrentUser = Depends(get_current_user_async)):
     return {
-        "has_face_data": bool(current_user.face_encoding),
+        "has_face_data": current_user.has_face,
         "user_id": current_user.user_id
     }
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.db import schemas
-from app.db.database import get_db
-from app.services import candidate_service
+from app.db.database import get_async_db, get_db
+from app.db.query_counter import sql_budget
+from app.services import async_candidate_service, candidate_service, read_cache
 from app.utils.auth_utils import require_admin
+from app.utils.pagination import PAGE_SIZE_MAX, validate_page
 
 router = APIRouter()
 
@@ -16,24 +21,32 @@ def create_candidate(candidate: schemas.CandidateBase, db: Session = Depends(get
 
 
 @router.get("/", response_model=list[schemas.CandidateOut])
-def list_candidates(db: Session = Depends(get_db)):
-    """Get all candidates"""
-    return candidate_service.get_candidates(db)
+@sql_budget(2)
+async def list_candidates(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all candidates, or a page with limit/cursor; the next page's cursor is in the X-Next-Cursor header"""
+    async def load():
+        return validate_page(schemas.CandidateOut, await async_candidate_service.get_candidates(db, cursor, limit))
+    return await read_cache.cached_response_async(request, db, ("candidates", cursor, limit), load)
 
 
 @router.get("/id/{candiate_id}", response_model=schemas.CandidateBase)
-def get_candidate_with_id(candidate_id: str, db: Session = Depends(get_db)):
+async def get_candidate_with_id(candidate_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get a candidate by ID"""
-    candidate = candidate_service.get_candidate_by_id(db, candidate_id)
+    candidate = await async_candidate_service.get_candidate_by_id(db, candidate_id)
     if not candidate:
         raise HTTPException(status_code=404, detail="Candidate not found")
     return candidate
 
 
 @router.get("/name/{candiate_name}", response_model=schemas.CandidateBase)
-def get_candidate_with_name(candidate_name: str, db: Session = Depends(get_db)):
+async def get_candidate_with_name(candidate_name: str, db: AsyncSession = Depends(get_async_db)):
     """Get a candidate by name"""
-    candidate = candidate_service.get_candidate_by_name(db, candidate_name)
+    candidate = await async_candidate_service.get_candidate_by_name(db, candidate_name)
     if not candidate:
         raise HTTPException(status_code=404, detail="Candidate not found")
     return candidate
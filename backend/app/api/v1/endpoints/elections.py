@@ -1,40 +1,54 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import models, schemas
-from app.db.database import get_db
-from app.services import election_service
-from app.utils.auth_utils import get_current_user, require_admin
+from app.db import schemas
+from app.db.database import get_async_db, get_db
+from app.db.query_counter import sql_budget
+from app.services import async_election_service, election_service, read_cache, results_stream
+from app.utils.auth_utils import get_current_user, get_current_user_async, get_streaming_user, require_admin
+from app.utils.pagination import PAGE_SIZE_MAX, validate_page
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[schemas.ElectionOut])
-def get_elections(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+@sql_budget(4)
+async def get_elections(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async)
 ):
-    """Get all elections"""
-    return election_service.get_elections(db)
+    """Get all elections, or a page with limit/cursor; the next page's cursor is in the X-Next-Cursor header"""
+    async def load():
+        return validate_page(schemas.ElectionOut, await async_election_service.get_elections(db, cursor, limit))
+    return await read_cache.cached_response_async(request, db, ("elections", cursor, limit), load)
 
 
 @router.get("/{election_id}", response_model=schemas.ElectionOut)
-def get_election(
+@sql_budget(4)
+async def get_election(
     election_id: str,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async)
 ):
     """Get a specific election by ID"""
-    return election_service.get_election(db, election_id)
+    async def load():
+        return schemas.ElectionOut.model_validate(await async_election_service.get_election(db, election_id))
+    return await read_cache.cached_response_async(request, db, ("election", election_id), load)
 
 
 @router.post("/", response_model=schemas.ElectionOut)
 def create_election(
     election: schemas.ElectionCreate,
     db: Session = Depends(get_db),
-    admin: models.User = Depends(require_admin)
+    admin: schemas.CurrentUser = Depends(require_admin)
 ):
     """Create a new election (admin only)"""
     return election_service.create_election(db, election)
@@ -45,7 +59,7 @@ def update_election(
     election_id: str,
     election_update: schemas.ElectionCreate,
     db: Session = Depends(get_db),
-    admin: models.User = Depends(require_admin)
+    admin: schemas.CurrentUser = Depends(require_admin)
 ):
     """Update an election (admin only)"""
     return election_service.update_election(db, election_id, election_update)
@@ -55,7 +69,7 @@ def update_election(
 def delete_election(
     election_id: str,
     db: Session = Depends(get_db),
-    admin: models.User = Depends(require_admin)
+    admin: schemas.CurrentUser = Depends(require_admin)
 ):
     """Delete an election (admin only)"""
     return election_service.delete_election(db, election_id)
@@ -65,7 +79,7 @@ def delete_election(
 def start_election(
     election_id: str,
     db: Session = Depends(get_db),
-    admin: models.User = Depends(require_admin)
+    admin: schemas.CurrentUser = Depends(require_admin)
 ):
     """Start an election (admin only)"""
     return election_service.start_election(db, election_id)
@@ -75,28 +89,57 @@ def start_election(
 def end_election(
     election_id: str,
     db: Session = Depends(get_db),
-    admin: models.User = Depends(require_admin)
+    admin: schemas.CurrentUser = Depends(require_admin)
 ):
     """End an election (admin only)"""
     return election_service.end_election(db, election_id)
 
 
 @router.get("/{election_id}/results", response_model=schemas.VoteSummary)
+# Elections that ended before snapshots existed take the snapshot on first read
+@sql_budget(6)
 def get_election_results(
     election_id: str,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
     """Get election results"""
     return election_service.get_election_results(db, election_id)
 
 
+@router.get("/{election_id}/stream")
+async def stream_election_results(
+    election_id: str,
+    last_event_id: Optional[str] = Header(None),
+    current_user: schemas.CurrentUser = Depends(get_streaming_user)
+):
+    """Stream turnout and vote counts as Server-Sent Events"""
+    events = await results_stream.subscribe(
+        election_id, show_counts=current_user.role == "admin", last_event_id=last_event_id)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{election_id}/tallies/check")
+def check_election_tallies(
+    election_id: str,
+    repair: bool = False,
+    db: Session = Depends(get_db),
+    admin: schemas.CurrentUser = Depends(require_admin)
+):
+    """Check vote counters against the votes, optionally rebuilding them (admin only)"""
+    return election_service.check_election_tallies(db, election_id, repair)
+
+
 @router.post("/{election_id}/vote")
 def cast_vote(
     election_id: str,
     vote: schemas.VoteCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
     """Cast a vote in an election"""
     return election_service.cast_vote(db, election_id, vote, current_user)
@@ -107,7 +150,7 @@ def add_candidate_to_election(
     election_id: str,
     candidate_id: str,
     db: Session = Depends(get_db),
-    admin: models.User = Depends(require_admin)
+    admin: schemas.CurrentUser = Depends(require_admin)
 ):
     """Add a candidate to an election (admin only)"""
     return election_service.add_candidate_to_election(db, election_id, candidate_id)
@@ -118,35 +161,36 @@ def remove_candidate_from_election(
     election_id: str,
     candidate_id: str,
     db: Session = Depends(get_db),
-    admin: models.User = Depends(require_admin)
+    admin: schemas.CurrentUser = Depends(require_admin)
 ):
     """Remove a candidate from an election (admin only)"""
     return election_service.remove_candidate_from_election(db, election_id, candidate_id)
 
 
 @router.get("/{election_id}/candidates", response_model=List[schemas.CandidateOut])
-def get_election_candidates(
+@sql_budget(4)
+async def get_election_candidates(
     election_id: str,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async)
 ):
     """Get all candidates registered for an election"""
-    return election_service.get_election_candidates(db, election_id)
+    async def load():
+        return [schemas.CandidateOut.model_validate(candidate)
+                for candidate in await async_election_service.get_election_candidates(db, election_id)]
+    return await read_cache.cached_response_async(request, db, ("election_candidates", election_id), load)
 
 
 @router.get("/{election_id}/vote-status")
+@sql_budget(2)
 async def check_vote_status(
     election_id: str,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async)
 ):
     """Check if the current user has voted in this election"""
-    vote = db.query(models.Vote).filter(
-        models.Vote.election_id == election_id,
-        models.Vote.voter_id == current_user.user_id
-    ).first()
-    
-    if not vote:
+    if not await async_election_service.has_voted(db, election_id, current_user.user_id):
         raise HTTPException(status_code=404, detail="Vote not found")
-    
+
     return {"has_voted": True}
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+import shutil
+import tempfile
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.db import schemas
-from app.db.database import get_db
-from app.db.models import User
-from app.services import user_service
-from app.utils.auth_utils import get_current_user, require_role
+from app.db.database import get_async_db, get_db
+from app.db.query_counter import sql_budget
+from app.services import async_user_service, enrollment_service, user_service
+from app.utils.auth_utils import get_current_user, require_admin, require_role
+from app.utils.pagination import PAGE_SIZE_MAX, set_next_cursor
 
 router = APIRouter()
 
@@ -18,22 +24,49 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         if db_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         return user_service.create_user(db=db, user=user)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/", response_model=list[schemas.UserOut])
-def read_users(skip: int = 0, limit: int = 0, db: Session = Depends(get_db)):
-    """Get all users"""
-    users = user_service.get_users(db)
-    return users
+@sql_budget(1)
+async def read_users(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all users, or a page with limit/cursor; the next page's cursor is in the X-Next-Cursor header"""
+    page = await async_user_service.get_users(db, cursor, limit)
+    set_next_cursor(response, page)
+    return page.items
 
 
 @router.patch("/{user_id}/role")
-def change_user_role(user_id:str, new_role:str,db:Session = Depends(get_db),current_user: User = Depends(get_current_user)):
+def change_user_role(user_id:str, new_role:str,db:Session = Depends(get_db),current_user: schemas.CurrentUser = Depends(get_current_user)):
     """Change user role"""
     require_role(current_user, ["admin"])
     user = user_service.update_user_role(db, user_id, new_role)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message":f"User {user.full_name} promoted to role: {user.role}"}
+
+
+@router.post("/bulk", response_model=schemas.BulkEnrollmentStatus, status_code=202)
+def bulk_enroll_users(archive: UploadFile = File(...), current_user: schemas.CurrentUser = Depends(require_admin)):
+    """Enroll voters from a zip of manifest.csv plus photos (admin only)"""
+    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+        shutil.copyfileobj(archive.file, f)
+    return enrollment_service.start_bulk_enrollment(f.name)
+
+
+@router.get("/bulk/{job_id}", response_model=schemas.BulkEnrollmentStatus)
+def get_bulk_enrollment(job_id: str, db: Session = Depends(get_db),
+                        current_user: schemas.CurrentUser = Depends(require_admin)):
+    """Get the progress and row errors of a bulk enrollment job (admin only)"""
+    job = enrollment_service.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Enrollment job not found")
+    return job
@@ -1,14 +1,26 @@
-from pydantic import BaseSettings
+from typing import Optional
+
+from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
-    SECRET_KEY: str
-    ALGORITHM: str
-    ACCESS_TOKEN_EXPIRE_MINUTES: int
+    # Async driver URL; derived from DATABASE_URL (asyncpg / aiosqlite) when unset
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Not read yet: app.core.token still defines the values tokens are signed with
+    SECRET_KEY: Optional[str] = None
+    ALGORITHM: Optional[str] = None
+    ACCESS_TOKEN_EXPIRE_MINUTES: Optional[int] = None
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
 
     class Config:
         env_file = ".env"
+        extra = "ignore"
 
 
 settings = Settings()
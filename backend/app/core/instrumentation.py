@@ -0,0 +1,50 @@
+"""ASGI middleware recording latency and concurrency per route.
+
+Requests are labelled with the route template (``/api/v1/elections/{election_id}``)
+rather than the raw path, so label cardinality stays bounded. Requests that
+match no route share the ``unmatched`` label.
+"""
+import time
+
+from app.core.metrics import Gauge, Histogram
+
+request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve HTTP requests, by route",
+    ["method", "route", "status"],
+)
+requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+
+
+def route_label(scope) -> str:
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            request_seconds.observe(time.perf_counter() - start, method=scope["method"],
+                                    route=route_label(scope), status=status)
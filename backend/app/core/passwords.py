@@ -0,0 +1,102 @@
+"""Password hashing on a bounded pool of bcrypt workers.
+
+bcrypt is deliberately slow, so running it on the request threadpool lets a
+burst of logins starve every other endpoint. Hashes and checks run on their
+own ``PASSWORD_HASH_WORKERS`` threads instead, and at most
+``PASSWORD_HASH_QUEUE`` more may wait for one. The request thread of every
+admitted caller stays blocked until its hash is done, so the two together are
+capped at ``PASSWORD_HASH_MAX_CALLERS``, by default a quarter of the 40 threads
+anyio runs sync endpoints on. Beyond that, callers get an immediate ``503``
+with ``Retry-After`` rather than joining a queue they would time out in.
+
+The cost factor is ``PASSWORD_BCRYPT_ROUNDS``. Hashes made with a different
+cost still verify, and ``verify_and_update`` returns a fresh hash for them so
+logins migrate users to the configured cost.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.core.metrics import Counter, Gauge, Histogram
+
+# anyio's default limit on threads running sync endpoints and dependencies
+_REQUEST_THREADS = 40
+
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_MAX_CALLERS = int(os.getenv("PASSWORD_HASH_MAX_CALLERS", str(_REQUEST_THREADS // 4)))
+PASSWORD_HASH_WORKERS = int(os.getenv(
+    "PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 1, PASSWORD_HASH_MAX_CALLERS))))
+PASSWORD_HASH_QUEUE = int(os.getenv(
+    "PASSWORD_HASH_QUEUE", str(max(0, PASSWORD_HASH_MAX_CALLERS - PASSWORD_HASH_WORKERS))))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+# min/max pin the cost, so hashes made with any other cost need an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=PASSWORD_BCRYPT_ROUNDS,
+)
+
+queue_depth = Gauge(
+    "password_hash_queue_depth",
+    "Password hashes and checks waiting for a bcrypt worker",
+)
+wait_seconds = Histogram(
+    "password_hash_wait_seconds",
+    "Time a password hash or check waited for a bcrypt worker",
+    ["operation"],
+)
+rejected_total = Counter(
+    "password_hash_rejected_total",
+    "Password hashes and checks refused because the queue was full",
+    ["operation"],
+)
+
+# bcrypt releases the GIL, so threads are enough to use every core
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(
+    max(1, min(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE, PASSWORD_HASH_MAX_CALLERS)))
+
+
+def _run(operation: str, fn: Callable, *args):
+    """Run fn on the bcrypt pool and wait for it, or refuse with 503 when full"""
+    if not _slots.acquire(blocking=False):
+        rejected_total.inc(operation=operation)
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+        )
+
+    queued_at = time.perf_counter()
+    queue_depth.inc()
+
+    def task():
+        queue_depth.dec()
+        wait_seconds.observe(time.perf_counter() - queued_at, operation=operation)
+        return fn(*args)
+
+    try:
+        future = _executor.submit(task)
+    except BaseException:
+        queue_depth.dec()
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+
+def hash_password(password: str) -> str:
+    return _run("hash", pwd_context.hash, password)
+
+
+def verify_and_update(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Check a password, returning a replacement hash when the stored one is outdated"""
+    return _run("verify", pwd_context.verify_and_update, password, hashed_password)
@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime, timedelta
 
 from jose import JWTError, jwt
@@ -5,6 +6,8 @@ from jose import JWTError, jwt
 SECRET_KEY = "KEY"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+VOTE_TOKEN_EXPIRE_MINUTES = 5
+VOTE_TOKEN_TYPE = "vote"
 
 
 def create_access_token(data: dict, auth_type: str = "password", expires_delta: timedelta = None):
@@ -26,3 +29,23 @@ def verify_token(token: str):
         return payload
     except JWTError:
         return None
+
+
+def create_vote_token(user_id: str, election_id: str):
+    """Sign a single-use token proving the user just passed face verification for an election"""
+    expire = datetime.utcnow() + timedelta(minutes=VOTE_TOKEN_EXPIRE_MINUTES)
+    to_encode = {
+        "sub": user_id,
+        "typ": VOTE_TOKEN_TYPE,
+        "jti": uuid.uuid4().hex,
+        "exp": expire,
+        "election_id": election_id,
+    }
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM), expire
+
+
+def verify_vote_token(token: str):
+    payload = verify_token(token)
+    if not payload or payload.get("typ") != VOTE_TOKEN_TYPE:
+        return None
+    return payload
@@ -1,15 +1,37 @@
-import os
-
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from app.core.config import settings
+from app.db import query_counter  # noqa: F401  (registers the statement counter)
+from app.db.pool import TimedAsyncQueuePool, TimedQueuePool, instrument
+
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = settings.DATABASE_URL
+
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def _pool_options(url: str, poolclass) -> dict:
+    # SQLite picks its own pool (a single shared connection for :memory:)
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
 
-engine = create_engine(DATABASE_URL)
+
+engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL, TimedQueuePool))
+instrument(engine, "sync", settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -24,3 +46,38 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def async_database_url() -> str:
+    """ASYNC_DATABASE_URL, or DATABASE_URL switched to its async driver"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(DATABASE_URL)
+    return url.set(drivername=_ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(
+        hide_password=False)
+
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def get_async_engine():
+    """Create the async engine on first use, so its driver is only needed when used"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        url = async_database_url()
+        _async_engine = create_async_engine(url, **_pool_options(url, TimedAsyncQueuePool))
+        instrument(_async_engine.sync_engine, "async", settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, class_=AsyncSession, expire_on_commit=False)
+    return _async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
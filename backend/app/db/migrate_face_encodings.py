@@ -0,0 +1,55 @@
+"""Rewrite stored face encodings into the configured storage format.
+
+Walks ``users`` in primary-key order and commits once per batch, so it can be
+stopped and re-run safely while the API is serving traffic::
+
+    python -m app.db.migrate_face_encodings --batch-size 1000
+"""
+import argparse
+
+from app.db import models
+from app.db.database import SessionLocal
+from app.utils.face_encoding import (FACE_ENCODING_FORMAT, deserialize_encoding,
+                                     is_current_format, serialize_encoding)
+
+
+def migrate(batch_size: int = 1000, fmt: int = FACE_ENCODING_FORMAT) -> int:
+    """Convert every face encoding not yet in fmt, returning how many were rewritten"""
+    db = SessionLocal()
+    rewritten = 0
+    last_pk = 0
+    try:
+        while True:
+            rows = db.query(
+                models.User.id, models.User.face_encoding
+            ).filter(
+                models.User.id > last_pk,
+                models.User.face_encoding.isnot(None)
+            ).order_by(models.User.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            updates = [
+                {"id": pk, "face_encoding": serialize_encoding(deserialize_encoding(blob), fmt)}
+                for pk, blob in rows
+                if not is_current_format(blob, fmt)
+            ]
+            if updates:
+                db.bulk_update_mappings(models.User, updates)
+                db.commit()
+                rewritten += len(updates)
+            last_pk = rows[-1].id
+            print(f"Processed users up to id {last_pk}, rewritten {rewritten}")
+    finally:
+        db.close()
+    return rewritten
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate face encodings to the current storage format")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("Migrating face encodings")
+    migrate(batch_size=args.batch_size)
+    print("Done")
@@ -1,5 +1,5 @@
-from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Integer,
-                        LargeBinary, String, func, Enum)
+from sqlalchemy import (DDL, BigInteger, Boolean, Column, DateTime, ForeignKey, Index, Integer,
+                        LargeBinary, String, Text, UniqueConstraint, event, func, Enum)
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
@@ -17,6 +17,10 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     role = Column(String, default="voter")
     face_encoding = Column(LargeBinary, nullable=True)
+    # Stamped whenever face_encoding is written; FaceGallery.sync picks up changes by it
+    face_enrolled_at = Column(DateTime, nullable=True, index=True)
+    # Set when this account's face matches an earlier account's
+    duplicate_of = Column(String(6), nullable=True, index=True)
 
     votes = relationship("Vote", back_populates="voter")
     verification_sessions = relationship("FaceVerificationSession", back_populates="user")
@@ -57,6 +61,10 @@ class Election(Base):
 
 class Vote(Base):
     __tablename__ = "votes"
+    __table_args__ = (
+        UniqueConstraint("election_id", "voter_id", name="uq_votes_election_voter"),
+        Index("ix_votes_election_candidate", "election_id", "candidate_id"),
+    )
 
     vote_id = Column(String, primary_key=True)
     election_id = Column(String, ForeignKey("elections.election_id"), nullable=False)
@@ -77,6 +85,62 @@ class ElectionCandidate(Base):
     registration_date = Column(DateTime, nullable=False, server_default=func.now())
 
 
+class ElectionTally(Base):
+    __tablename__ = "election_tallies"
+
+    election_id = Column(String, ForeignKey("elections.election_id"), primary_key=True)
+    candidate_id = Column(String(6), ForeignKey("candidates.candidate_id"), primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    vote_count = Column(Integer, nullable=False, default=0)
+
+
+class ElectionResultSnapshot(Base):
+    __tablename__ = "election_result_snapshots"
+
+    election_id = Column(String, ForeignKey("elections.election_id"), primary_key=True)
+    # VoteSummary as canonical JSON; content_hash is its SHA-256
+    summary = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    winner_candidate_id = Column(String(6), ForeignKey("candidates.candidate_id"), nullable=True)
+    turnout = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class IdSequence(Base):
+    __tablename__ = "id_sequences"
+
+    name = Column(String, primary_key=True)
+    next_value = Column(BigInteger, nullable=False, default=0)
+
+
+class ReadCacheVersion(Base):
+    """The single row whose version every cached election and candidate read is keyed on"""
+    __tablename__ = "read_cache_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+# Created with its row, so bumping the version is always a plain UPDATE
+event.listen(ReadCacheVersion.__table__, "after_create",
+             DDL("INSERT INTO read_cache_version (id, version) VALUES (1, 0)"))
+
+
+class EnrollmentJob(Base):
+    __tablename__ = "enrollment_jobs"
+
+    job_id = Column(String, primary_key=True)
+    status = Column(String, nullable=False)
+    total_rows = Column(Integer, nullable=False, default=0)
+    processed_rows = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    # JSON list of {"row", "email", "detail"}
+    errors = Column(Text, nullable=False, default="[]")
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
 class FaceVerificationSession(Base):
     __tablename__ = "face_verification_sessions"
 
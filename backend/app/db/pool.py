@@ -0,0 +1,56 @@
+"""Connection pools that report checkout wait time and occupancy."""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.metrics import Gauge, Histogram
+
+checkout_wait_seconds = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+connections_in_use = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections currently checked out of the pool",
+    ["pool"],
+)
+pool_capacity = Gauge(
+    "db_pool_capacity",
+    "Pool size plus allowed overflow",
+    ["pool"],
+)
+
+
+class _TimedCheckout:
+    metrics_name = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_wait_seconds.observe(time.perf_counter() - start, pool=self.metrics_name)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_name = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+def instrument(engine, name: str, capacity: int):
+    """Track how many connections of an engine's pool are in use"""
+    pool_capacity.set(capacity, pool=name)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connections_in_use.inc(pool=name)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connections_in_use.dec(pool=name)
@@ -0,0 +1,46 @@
+"""Delete rows from the legacy ``face_verification_sessions`` table.
+
+Face verification now returns a signed vote token instead of writing a row, so
+nothing reads this table any more. Rows are deleted in primary-key batches with
+a commit after each, so the purge can run while the API is serving traffic::
+
+    python -m app.db.purge_face_sessions --batch-size 5000
+"""
+import argparse
+
+from app.db import models
+from app.db.database import SessionLocal
+
+
+def purge(batch_size: int = 5000) -> int:
+    """Delete every legacy verification session, returning how many were removed"""
+    db = SessionLocal()
+    deleted = 0
+    try:
+        while True:
+            ids = [
+                pk for (pk,) in
+                db.query(models.FaceVerificationSession.id)
+                .order_by(models.FaceVerificationSession.id).limit(batch_size)
+            ]
+            if not ids:
+                break
+            db.query(models.FaceVerificationSession).filter(
+                models.FaceVerificationSession.id.in_(ids)
+            ).delete(synchronize_session=False)
+            db.commit()
+            deleted += len(ids)
+            print(f"Deleted {deleted} verification sessions")
+    finally:
+        db.close()
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Purge legacy face verification sessions")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    print("Purging face verification sessions")
+    purge(batch_size=args.batch_size)
+    print("Done")
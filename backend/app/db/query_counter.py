@@ -0,0 +1,135 @@
+"""Per-request SQL statement counting, timing and query budgets.
+
+Every statement sent by any engine is counted and timed against the request
+that is running it; statement durations and per-request totals are exported as
+metrics. Endpoints declare how many statements they may issue with
+``@sql_budget(n)``; going over the budget logs a warning, or raises
+``QueryBudgetExceeded`` when ``SQL_BUDGET_STRICT`` is set, which is how test
+runs catch N+1 regressions; it is read on every check, so tests can switch it
+per case. ``SQL_COUNT_HEADER`` adds an ``X-DB-Queries``
+header with the count to every response.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.instrumentation import route_label
+from app.core.metrics import Histogram
+
+SQL_COUNT_HEADER = os.getenv("SQL_COUNT_HEADER", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+statement_seconds = Histogram(
+    "db_statement_duration_seconds",
+    "Time to execute single SQL statements",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0),
+)
+request_statements = Histogram(
+    "db_statements_per_request",
+    "SQL statements issued while serving one HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+request_db_seconds = Histogram(
+    "db_seconds_per_request",
+    "Time spent in SQL statements while serving one HTTP request",
+    ["route"],
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCount:
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# A mutable holder, so statements issued from threadpool copies of the context still count
+_current: ContextVar[Optional[QueryCount]] = ContextVar("sql_query_count", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    # A connection runs one statement at a time, so one slot is enough
+    conn.info["statement_start"] = time.perf_counter()
+    count = _current.get()
+    if count is not None:
+        count.statements += 1
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _time_statement(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("statement_start", None)
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    statement_seconds.observe(seconds)
+    count = _current.get()
+    if count is not None:
+        count.seconds += seconds
+
+
+def budget_strict() -> bool:
+    return os.getenv("SQL_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
+
+
+def current() -> Optional[QueryCount]:
+    """The statement count of the running request, if any"""
+    return _current.get()
+
+
+def sql_budget(statements: int):
+    """Declare the most SQL statements an endpoint may issue per request"""
+    def decorator(endpoint):
+        endpoint.__sql_budget__ = statements
+        return endpoint
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        count = QueryCount()
+        token = _current.set(count)
+
+        async def send_with_count(message):
+            # The handler has finished by the time the response starts
+            if message["type"] == "http.response.start":
+                _check_budget(scope, count)
+                if SQL_COUNT_HEADER:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-db-queries", str(count.statements).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _current.reset(token)
+            route = route_label(scope)
+            request_statements.observe(count.statements, route=route)
+            request_db_seconds.observe(count.seconds, route=route)
+
+
+def _check_budget(scope, count: QueryCount):
+    budget = getattr(scope.get("endpoint"), "__sql_budget__", None)
+    if budget is None or count.statements <= budget:
+        return
+    detail = f"{scope['method']} {scope['path']} ran {count.statements} SQL statements, budget is {budget}"
+    if budget_strict():
+        raise QueryBudgetExceeded(detail)
+    logger.warning(detail)
@@ -17,6 +17,7 @@ class UserCreate(UserBase):
 
 class UserOut(UserBase):
     user_id: str
+    duplicate_of: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -29,6 +30,39 @@ class UserInfo(BaseModel):
     role: str
 
 
+class BulkEnrollmentError(BaseModel):
+    row: int
+    email: Optional[str] = None
+    detail: str
+
+
+class BulkEnrollmentStatus(BaseModel):
+    job_id: str
+    status: str
+    total_rows: int
+    processed_rows: int
+    created: int
+    failed: int
+    errors: List[BulkEnrollmentError] = []
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CurrentUser(BaseModel):
+    """Slim view of the authenticated user, cached between requests"""
+    user_id: str
+    email: str
+    full_name: str
+    role: str
+    has_face: bool
+
+    class Config:
+        frozen = True
+
+
 class LoginInput(BaseModel):
     email: EmailStr
     password: str
@@ -58,6 +92,7 @@ class CandidateOut(CandidateBase):
 
 class VoteCreate(BaseModel):
     candidate_id: str
+    vote_token: Optional[str] = None
 
 
 class VoteOut(BaseModel):
@@ -80,6 +115,7 @@ class VoteResults(BaseModel):
 class VoteSummary(BaseModel):
     results: list[VoteResults]
     winner: VoteResults
+    turnout: Optional[int] = None
 
 
 class VotingSessionBase(BaseModel):
@@ -130,6 +166,13 @@ class FaceRegistrationRequest(BaseModel):
     face_image: str  # Base64 encoded image
 
 
+class FaceVerificationResult(BaseModel):
+    message: str
+    vote_token: str
+    expires_at: datetime
+    election_id: str
+
+
 class FaceVerificationSession(BaseModel):
     user_id: str
     expires_at: datetime
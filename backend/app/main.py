@@ -3,19 +3,48 @@ import os
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.api.v1.api import api_router
-from app.db.database import Base, engine
+from app.core import metrics
+from app.core.instrumentation import RequestMetricsMiddleware
+from app.db.database import Base, dispose_async_engine, engine
+from app.db.query_counter import QueryBudgetMiddleware
+from app.services import face_pipeline
 
 load_dotenv()
 Base.metadata.create_all(bind=engine)
 app = FastAPI(title="Voting System with Face Recogition")
 app.include_router(api_router, prefix="/api/v1")
 
+
+@app.on_event("startup")
+def start_face_pipeline():
+    face_pipeline.start()
+
+
+@app.on_event("shutdown")
+def stop_face_pipeline():
+    face_pipeline.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render())
+
+
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins="*",
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
@@ -0,0 +1,27 @@
+"""AsyncSession variants of the read paths in candidate_service."""
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import models
+from app.utils.pagination import Page, paginate_async
+
+
+async def get_candidates(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """Get the candidates in creation order, or one page of them"""
+    return await paginate_async(db, select(models.Candidate), models.Candidate.id, cursor, limit)
+
+
+async def get_candidate_by_name(db: AsyncSession, candidate_name: str):
+    """Get a candidate by name"""
+    result = await db.execute(
+        select(models.Candidate).where(models.Candidate.name == candidate_name).limit(1))
+    return result.scalar_one_or_none()
+
+
+async def get_candidate_by_id(db: AsyncSession, candidate_id: str):
+    """Get a candidate by ID"""
+    result = await db.execute(
+        select(models.Candidate).where(models.Candidate.candidate_id == candidate_id))
+    return result.scalar_one_or_none()
@@ -0,0 +1,53 @@
+"""AsyncSession variants of the read paths in election_service."""
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.db import models
+from app.utils.pagination import Page, paginate_async
+
+
+async def get_elections(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """Get the elections ordered by ID, or one page of them"""
+    statement = select(models.Election).options(selectinload(models.Election.candidates))
+    return await paginate_async(db, statement, models.Election.election_id, cursor, limit)
+
+
+async def get_election(db: AsyncSession, election_id: str):
+    """Get a specific election by ID"""
+    result = await db.execute(
+        select(models.Election)
+        .options(selectinload(models.Election.candidates))
+        .where(models.Election.election_id == election_id))
+    election = result.scalar_one_or_none()
+    if not election:
+        raise HTTPException(status_code=404, detail="Election not found")
+    return election
+
+
+async def get_election_candidates(db: AsyncSession, election_id: str):
+    """Get all candidates registered for an election"""
+    election = await db.scalar(
+        select(models.Election.election_id).where(models.Election.election_id == election_id))
+    if not election:
+        raise HTTPException(status_code=404, detail="Election not found")
+
+    result = await db.execute(
+        select(models.Candidate).join(
+            models.ElectionCandidate,
+            models.ElectionCandidate.candidate_id == models.Candidate.candidate_id
+        ).where(models.ElectionCandidate.election_id == election_id))
+    return result.scalars().all()
+
+
+async def has_voted(db: AsyncSession, election_id: str, voter_id: str) -> bool:
+    """Check if a voter has a vote in an election"""
+    result = await db.execute(
+        select(models.Vote.vote_id).where(
+            models.Vote.election_id == election_id,
+            models.Vote.voter_id == voter_id
+        ).limit(1))
+    return result.first() is not None
@@ -0,0 +1,28 @@
+"""AsyncSession variants of the read paths in user_service."""
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import models
+from app.services.user_service import principal_cache, principal_query, to_principal
+from app.utils.pagination import Page, paginate_async
+
+
+async def get_user_principal(db: AsyncSession, user_id: str):
+    """Get the cached principal of a user, loading it without the face blob on a miss"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    row = (await db.execute(principal_query().where(models.User.user_id == user_id))).first()
+    if not row:
+        return None
+    principal = to_principal(row)
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+async def get_users(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """Get the users in creation order, or one page of them"""
+    return await paginate_async(db, select(models.User), models.User.id, cursor, limit)
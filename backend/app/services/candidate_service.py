@@ -1,14 +1,17 @@
+from typing import Optional
+
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 from app.db import models, schemas
 from app.db.models import Candidate
-from app.utils.id_generator import generate_id
+from app.services import id_allocator, read_cache
+from app.utils.pagination import Page, paginate
 
 
-def get_candidates(db: Session):
-    """Get all candidates"""
-    return db.query(models.Candidate).all()
+def get_candidates(db: Session, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """Get the candidates in creation order, or one page of them"""
+    return paginate(db.query(models.Candidate), models.Candidate.id, cursor, limit)
 
 
 def get_candidate(db: Session, candidate_id: str):
@@ -21,10 +24,7 @@ def get_candidate(db: Session, candidate_id: str):
 
 def create_candidate(db: Session, candidate: schemas.CandidateCreate):
     """Create a new candidate"""
-    while True:
-        candidate_id = generate_id()
-        if not db.query(models.Candidate).filter(models.Candidate.candidate_id == candidate_id).first():
-            break
+    candidate_id = id_allocator.candidate_ids.next_id(db)
 
     db_candidate = models.Candidate(
         candidate_id=candidate_id,
@@ -33,6 +33,7 @@ def create_candidate(db: Session, candidate: schemas.CandidateCreate):
         manifesto=candidate.manifesto
     )
     db.add(db_candidate)
+    read_cache.bump(db)
     db.commit()
     db.refresh(db_candidate)
     return db_candidate
@@ -47,6 +48,7 @@ def update_candidate(db: Session, candidate_id: str, candidate: schemas.Candidat
     for key, value in candidate.dict().items():
         setattr(db_candidate, key, value)
 
+    read_cache.bump(db)
     db.commit()
     db.refresh(db_candidate)
     return db_candidate
@@ -59,6 +61,7 @@ def delete_candidate(db: Session, candidate_id: str):
         raise HTTPException(status_code=404, detail="Candidate not found")
 
     db.delete(db_candidate)
+    read_cache.bump(db)
     db.commit()
     return {"message": "Candidate deleted successfully"}
 
@@ -79,8 +82,3 @@ def get_candidate_by_id(db: Session, candidate_id: str):
         .filter(models.Candidate.candidate_id == candidate_id)
         .first()
     )
-
-
-def get_candidates(db: Session, skip: int = 0, limit: int = 10):
-    """Get all candidates with pagination"""
-    return db.query(models.Candidate).offset(skip).limit(limit).all()
@@ -1,42 +1,40 @@
+import logging
 from datetime import datetime
+from typing import Optional
+
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import DateTime, String, insert, inspect, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 
 from app.db import models, schemas
-from app.utils.id_generator import generate_id
+from app.services import (id_allocator, read_cache, results_snapshot, tally_service, vote_ingest,
+                          vote_token_service)
+from app.utils.id_generator import generate_time_id
+from app.utils.pagination import Page, paginate
+
+logger = logging.getLogger(__name__)
 
 
-def get_elections(db: Session):
-    """Get all elections"""
-    return db.query(models.Election).all()
+def get_elections(db: Session, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """Get the elections ordered by ID, or one page of them"""
+    query = db.query(models.Election).options(selectinload(models.Election.candidates))
+    return paginate(query, models.Election.election_id, cursor, limit)
 
 
 def get_election(db: Session, election_id: str):
     """Get a specific election by ID"""
-    election = db.query(models.Election).filter(models.Election.election_id == election_id).first()
+    election = db.query(models.Election).options(
+        selectinload(models.Election.candidates)
+    ).filter(models.Election.election_id == election_id).first()
     if not election:
         raise HTTPException(status_code=404, detail="Election not found")
-    
-    # Get candidates for this election
-    candidates = db.query(models.Candidate).join(
-        models.ElectionCandidate,
-        models.ElectionCandidate.candidate_id == models.Candidate.candidate_id
-    ).filter(
-        models.ElectionCandidate.election_id == election_id
-    ).all()
-    
-    # Add candidates to the election object
-    election.candidates = candidates
     return election
 
 
 def create_election(db: Session, election: schemas.ElectionCreate):
     """Create a new election"""
-    while True:
-        election_id = generate_id()
-        if not db.query(models.Election).filter(models.Election.election_id == election_id).first():
-            break
+    election_id = id_allocator.election_ids.next_id(db)
 
     db_election = models.Election(
         election_id=election_id,
@@ -47,6 +45,7 @@ def create_election(db: Session, election: schemas.ElectionCreate):
         status=models.ElectionStatus.UPCOMING
     )
     db.add(db_election)
+    read_cache.bump(db)
     db.commit()
     db.refresh(db_election)
     return db_election
@@ -61,6 +60,7 @@ def update_election(db: Session, election_id: str, election_update: schemas.Elec
     for key, value in election_update.dict().items():
         setattr(db_election, key, value)
 
+    read_cache.bump(db)
     db.commit()
     db.refresh(db_election)
     return db_election
@@ -75,12 +75,18 @@ def delete_election(db: Session, election_id: str):
     # Delete all votes associated with this election
     db.query(models.Vote).filter(models.Vote.election_id == election_id).delete()
     
+    db.query(models.ElectionTally).filter(models.ElectionTally.election_id == election_id).delete()
+    db.query(models.ElectionResultSnapshot).filter(
+        models.ElectionResultSnapshot.election_id == election_id).delete()
+
     # Delete all election-candidate associations
     db.query(models.ElectionCandidate).filter(models.ElectionCandidate.election_id == election_id).delete()
     
     # Now delete the election
     db.delete(db_election)
+    read_cache.bump(db)
     db.commit()
+    results_snapshot.forget(election_id)
     return {"message": "Election deleted successfully"}
 
 
@@ -94,13 +100,17 @@ def start_election(db: Session, election_id: str):
         raise HTTPException(status_code=400, detail="Election is not in upcoming status")
 
     db_election.status = models.ElectionStatus.ACTIVE
+    read_cache.bump(db)
     db.commit()
     return {"message": "Election started successfully"}
 
 
 def end_election(db: Session, election_id: str):
     """End an election"""
-    db_election = db.query(models.Election).filter(models.Election.election_id == election_id).first()
+    # The row lock waits out ballots still being stored, which share-lock it,
+    # and makes later ones see the election closed
+    db_election = db.query(models.Election).filter(
+        models.Election.election_id == election_id).with_for_update().first()
     if not db_election:
         raise HTTPException(status_code=404, detail="Election not found")
 
@@ -108,12 +118,20 @@ def end_election(db: Session, election_id: str):
         raise HTTPException(status_code=400, detail="Election is not active")
 
     db_election.status = models.ElectionStatus.COMPLETED
+    read_cache.bump(db)
+    snapshot = results_snapshot.build_snapshot(db, election_id)
+    db.add(snapshot)
     db.commit()
+    results_snapshot.remember(snapshot)
     return {"message": "Election ended successfully"}
 
 
 def get_election_results(db: Session, election_id: str):
-    """Get election results"""
+    """Get election results from the snapshot taken when it ended"""
+    summary = results_snapshot.cached_summary(db, election_id)
+    if summary is not None:
+        return summary
+
     election = db.query(models.Election).filter(models.Election.election_id == election_id).first()
     if not election:
         raise HTTPException(status_code=404, detail="Election not found")
@@ -121,45 +139,13 @@ def get_election_results(db: Session, election_id: str):
     if election.status != models.ElectionStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Election results are not available yet")
 
-    # Get vote counts for each candidate
-    results = db.query(
-        models.Candidate.name,
-        models.Candidate.party,
-        func.count(models.Vote.vote_id).label('vote_count')
-    ).join(
-        models.Vote,
-        models.Vote.candidate_id == models.Candidate.candidate_id
-    ).filter(
-        models.Vote.election_id == election_id
-    ).group_by(
-        models.Candidate.candidate_id,
-        models.Candidate.name,
-        models.Candidate.party
-    ).all()
-
-    if not results:
-        raise HTTPException(status_code=404, detail="No votes found for this election")
+    # Elections that ended before snapshots existed get one on first read
+    results_snapshot.remember(results_snapshot.create_snapshot(db, election_id))
+    return results_snapshot.cached_summary(db, election_id)
 
-    # Convert to VoteResults objects
-    vote_results = [
-        schemas.VoteResults(
-            name=result.name,
-            party=result.party,
-            vote_count=result.vote_count
-        ) for result in results
-    ]
-
-    # Find winner
-    winner = max(vote_results, key=lambda x: x.vote_count)
-
-    return schemas.VoteSummary(
-        results=vote_results,
-        winner=winner
-    )
 
-
-def cast_vote(db: Session, election_id: str, vote: schemas.VoteCreate, current_user: models.User):
-    """Cast a vote in an election"""
+def _check_vote_target(db: Session, election_id: str, candidate_id: str):
+    """Raise the error explaining why a ballot for this election/candidate is not accepted"""
     # Check if election exists and is active
     election = db.query(models.Election).filter(models.Election.election_id == election_id).first()
     if not election:
@@ -167,50 +153,115 @@ def cast_vote(db: Session, election_id: str, vote: schemas.VoteCreate, current_u
     if election.status != models.ElectionStatus.ACTIVE:
         raise HTTPException(status_code=400, detail="Election is not active")
 
-    # Check if user has already voted
-    existing_vote = db.query(models.Vote).filter(
-        models.Vote.election_id == election_id,
-        models.Vote.voter_id == current_user.user_id
-    ).first()
-    if existing_vote:
-        raise HTTPException(status_code=400, detail="You have already voted in this election")
-
     # Check if candidate is registered in this election
     candidate_registration = db.query(models.ElectionCandidate).filter(
         models.ElectionCandidate.election_id == election_id,
-        models.ElectionCandidate.candidate_id == vote.candidate_id
+        models.ElectionCandidate.candidate_id == candidate_id
     ).first()
     if not candidate_registration:
         raise HTTPException(status_code=400, detail="Candidate is not registered for this election")
 
-    # Create new vote
-    vote_id = generate_id()
-    new_vote = models.Vote(
-        vote_id=vote_id,
-        election_id=election_id,
-        voter_id=current_user.user_id,
-        candidate_id=vote.candidate_id,
-        timestamp=datetime.utcnow()
+
+_one_vote_constraint: Optional[bool] = None
+
+
+def _one_vote_enforced(db: Session) -> bool:
+    """Whether votes has the unique (election_id, voter_id) constraint from migration 0001"""
+    global _one_vote_constraint
+    if _one_vote_constraint is None:
+        inspector = inspect(db.get_bind())
+        names = {c["name"] for c in inspector.get_unique_constraints("votes")}
+        names.update(i["name"] for i in inspector.get_indexes("votes") if i.get("unique"))
+        _one_vote_constraint = "uq_votes_election_voter" in names
+        if not _one_vote_constraint:
+            logger.warning("votes lacks uq_votes_election_voter; run 'alembic upgrade head'. "
+                           "Checking for an earlier ballot before every vote until then")
+    return _one_vote_constraint
+
+
+def cast_vote(db: Session, election_id: str, vote: schemas.VoteCreate, current_user: schemas.CurrentUser):
+    """Cast a vote in an election"""
+    with vote_token_service.redeem(vote.vote_token, current_user.user_id, election_id):
+        _store_vote(db, election_id, vote.candidate_id, current_user.user_id)
+    return {"message": "Vote cast successfully"}
+
+
+def _store_vote(db: Session, election_id: str, candidate_id: str, voter_id: str):
+    """Store one ballot, returning only once it is committed"""
+    vote_id = generate_time_id()
+    timestamp = datetime.utcnow()
+
+    if not _one_vote_enforced(db):
+        # Check if user has already voted
+        if has_voted(db, election_id, voter_id):
+            raise HTTPException(status_code=400, detail="You have already voted in this election")
+
+    if vote_ingest.batcher is not None:
+        _check_vote_target(db, election_id, candidate_id)
+        # Give the connection back before waiting: the writer takes one from the same pool
+        db.close()
+        vote_ingest.batcher.submit({
+            "vote_id": vote_id,
+            "election_id": election_id,
+            "voter_id": voter_id,
+            "candidate_id": candidate_id,
+            "timestamp": timestamp,
+        })
+        return
+
+    # Insert only if the election is active and the candidate registered in it,
+    # share-locking the election so end_election waits for this ballot; the
+    # unique (election_id, voter_id) constraint rejects a second ballot
+    new_vote = insert(models.Vote).from_select(
+        ["vote_id", "election_id", "voter_id", "candidate_id", "timestamp"],
+        select(
+            literal(vote_id, String),
+            models.ElectionCandidate.election_id,
+            literal(voter_id, String),
+            models.ElectionCandidate.candidate_id,
+            literal(timestamp, DateTime)
+        ).join(
+            models.Election,
+            models.Election.election_id == models.ElectionCandidate.election_id
+        ).where(
+            models.ElectionCandidate.election_id == election_id,
+            models.ElectionCandidate.candidate_id == candidate_id,
+            models.Election.status == models.ElectionStatus.ACTIVE
+        ).with_for_update(read=True, of=models.Election)
     )
-    db.add(new_vote)
+    try:
+        inserted = db.execute(new_vote).rowcount
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="You have already voted in this election")
+
+    if not inserted:
+        db.rollback()
+        _check_vote_target(db, election_id, candidate_id)
+        raise HTTPException(status_code=400, detail="Election is not active")
+
+    tally_service.increment_tally(db, election_id, candidate_id)
     db.commit()
-    return {"message": "Vote cast successfully"}
+
+
+def has_voted(db: Session, election_id: str, voter_id: str) -> bool:
+    """Check if a voter has a vote in an election"""
+    return db.query(models.Vote.vote_id).filter(
+        models.Vote.election_id == election_id,
+        models.Vote.voter_id == voter_id
+    ).first() is not None
 
 
 def add_candidate_to_election(db: Session, election_id: str, candidate_id: str):
     """Add a candidate to an election"""
-    print(f"Adding candidate {candidate_id} to election {election_id}")
-    
     # Check if election exists
     election = db.query(models.Election).filter(models.Election.election_id == election_id).first()
     if not election:
-        print(f"Election {election_id} not found")
         raise HTTPException(status_code=404, detail="Election not found")
     
     # Check if candidate exists
     candidate = db.query(models.Candidate).filter(models.Candidate.candidate_id == candidate_id).first()
     if not candidate:
-        print(f"Candidate {candidate_id} not found")
         raise HTTPException(status_code=404, detail="Candidate not found")
     
     # Check if candidate is already in the election
@@ -219,7 +270,6 @@ def add_candidate_to_election(db: Session, election_id: str, candidate_id: str):
         models.ElectionCandidate.candidate_id == candidate_id
     ).first()
     if existing:
-        print(f"Candidate {candidate_id} is already in election {election_id}")
         raise HTTPException(status_code=400, detail="Candidate is already registered for this election")
     
     # Add candidate to election
@@ -228,8 +278,10 @@ def add_candidate_to_election(db: Session, election_id: str, candidate_id: str):
         candidate_id=candidate_id
     )
     db.add(election_candidate)
+    tally_service.create_tallies(db, election_id, candidate_id)
+    read_cache.bump(db)
     db.commit()
-    print(f"Successfully added candidate {candidate_id} to election {election_id}")
+    logger.info("Added candidate %s to election %s", candidate_id, election_id)
     
     return {"message": "Candidate added to election successfully"}
 
@@ -254,8 +306,10 @@ def remove_candidate_from_election(db: Session, election_id: str, candidate_id:
     if not election_candidate:
         raise HTTPException(status_code=404, detail="Candidate is not registered for this election")
     
-    # Remove candidate from election
+    # Remove candidate from election, with its counters
     db.delete(election_candidate)
+    tally_service.delete_tallies(db, election_id, candidate_id)
+    read_cache.bump(db)
     db.commit()
     
     return {"message": "Candidate removed from election successfully"}
@@ -276,4 +330,14 @@ def get_election_candidates(db: Session, election_id: str):
         models.ElectionCandidate.election_id == election_id
     ).all()
     
-    return candidates 
\ No newline at end of file
+    return candidates 
+
+
+def check_election_tallies(db: Session, election_id: str, repair: bool = False):
+    """Check the vote counters of an election against its votes"""
+    election = db.query(models.Election).filter(models.Election.election_id == election_id).first()
+    if not election:
+        raise HTTPException(status_code=404, detail="Election not found")
+    if repair and election.status == models.ElectionStatus.ACTIVE:
+        raise HTTPException(status_code=400, detail="Cannot rebuild tallies while the election is active")
+    return tally_service.check_tallies(db, election_id, repair=repair)
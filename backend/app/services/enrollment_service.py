@@ -0,0 +1,243 @@
+"""Bulk voter enrollment from an archive of a CSV manifest plus photos.
+
+The archive is a zip file holding ``manifest.csv`` with the columns
+``email, full_name, password, photo`` and optionally ``role``, where ``photo``
+is the path of the image inside the archive. Rows are processed in chunks: the
+faces of a chunk are streamed through the face worker pool, a bounded window
+of photos at a time, while the passwords are hashed on a thread pool, then the
+whole chunk is inserted with one commit.
+Progress and per-row errors are written to ``enrollment_jobs`` after every
+chunk, so any worker can report on a job another one is running.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.passwords import pwd_context
+from app.db import models, schemas
+from app.db.database import SessionLocal
+from app.services import face_duplicates, face_pipeline, id_allocator
+from app.services.face_gallery import gallery
+from app.services.user_service import build_user_with_face
+
+MANIFEST_NAME = "manifest.csv"
+ENROLLMENT_BATCH_SIZE = int(os.getenv("ENROLLMENT_BATCH_SIZE", "200"))
+ENROLLMENT_HASH_WORKERS = int(os.getenv("ENROLLMENT_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+# Apart from the login bcrypt pool, so an import neither starves logins nor trips their admission control
+_hash_executor = ThreadPoolExecutor(max_workers=ENROLLMENT_HASH_WORKERS, thread_name_prefix="enroll-hash")
+
+
+@dataclass
+class BulkEnrollmentJob:
+    job_id: str
+    status: str = "queued"
+    total_rows: int = 0
+    processed_rows: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def fail_row(self, row: int, email: Optional[str], detail: str):
+        self.errors.append({"row": row, "email": email, "detail": detail})
+        self.failed += 1
+
+
+def _save(job: BulkEnrollmentJob):
+    """Write the job's progress to its enrollment_jobs row"""
+    db = SessionLocal()
+    try:
+        db.merge(models.EnrollmentJob(
+            job_id=job.job_id,
+            status=job.status,
+            total_rows=job.total_rows,
+            processed_rows=job.processed_rows,
+            created=job.created,
+            failed=job.failed,
+            errors=json.dumps(job.errors),
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def get_job(db: Session, job_id: str) -> Optional[schemas.BulkEnrollmentStatus]:
+    """Get a bulk enrollment job by ID"""
+    row = db.query(models.EnrollmentJob).filter(models.EnrollmentJob.job_id == job_id).first()
+    if not row:
+        return None
+    return schemas.BulkEnrollmentStatus(
+        job_id=row.job_id,
+        status=row.status,
+        total_rows=row.total_rows,
+        processed_rows=row.processed_rows,
+        created=row.created,
+        failed=row.failed,
+        errors=json.loads(row.errors),
+        started_at=row.started_at,
+        finished_at=row.finished_at,
+    )
+
+
+def start_bulk_enrollment(archive_path: str) -> BulkEnrollmentJob:
+    """Start processing an archive in the background, taking ownership of the file"""
+    job = BulkEnrollmentJob(job_id=uuid.uuid4().hex)
+    try:
+        _save(job)
+    except Exception:
+        os.remove(archive_path)
+        raise
+    threading.Thread(target=_run, args=(job, archive_path), daemon=True,
+                     name=f"enroll-{job.job_id[:8]}").start()
+    return job
+
+
+def _parse_rows(job: BulkEnrollmentJob, archive: zipfile.ZipFile, chunk: list) -> list:
+    """Validate manifest rows, recording errors for the ones that can't be enrolled"""
+    valid = []
+    sizes = {info.filename: info.file_size for info in archive.infolist()}
+    for row_number, row in chunk:
+        email = (row.get("email") or "").strip() or None
+        try:
+            user = schemas.UserCreate(
+                email=email,
+                full_name=(row.get("full_name") or "").strip(),
+                password=row.get("password") or "",
+                role=(row.get("role") or "").strip() or "voter",
+            )
+        except ValidationError as e:
+            job.fail_row(row_number, email, f"Invalid row: {e.errors()[0]['msg']}")
+            continue
+        if not user.full_name or not user.password:
+            job.fail_row(row_number, email, "Email, full name, and password are required")
+            continue
+        photo = (row.get("photo") or "").strip()
+        if photo not in sizes:
+            job.fail_row(row_number, email, f"Photo not found in archive: {photo}")
+            continue
+        if sizes[photo] > face_pipeline.MAX_UPLOAD_BYTES:
+            job.fail_row(row_number, email, f"Photo is larger than {face_pipeline.MAX_UPLOAD_BYTES} bytes")
+            continue
+        valid.append((row_number, user, photo))
+    return valid
+
+
+def _process_chunk(job: BulkEnrollmentJob, archive: zipfile.ZipFile, chunk: list):
+    rows = _parse_rows(job, archive, chunk)
+
+    db = SessionLocal()
+    try:
+        emails = [user.email for _, user, _ in rows]
+        existing = {
+            email for (email,) in
+            db.query(models.User.email).filter(models.User.email.in_(emails))
+        }
+        seen = set()
+        pending = []
+        for row_number, user, photo in rows:
+            if user.email in existing or user.email in seen:
+                job.fail_row(row_number, user.email, "Email already registered")
+                continue
+            seen.add(user.email)
+            pending.append((row_number, user, photo))
+
+        # Photos are read only as the window moves, never a whole chunk at once
+        face_futures = face_pipeline.submit_stream((archive.read(photo) for _, _, photo in pending), "enroll")
+        hash_futures = [_hash_executor.submit(pwd_context.hash, user.password) for _, user, _ in pending]
+        user_ids = id_allocator.user_ids.take(db, len(pending))
+        # Commit the lease now: the chunk's row-by-row retry runs in new
+        # transactions, and a lease undone by a rollback may be reissued
+        db.commit()
+
+        new_users = []
+        for (row_number, user, _), face_future, hash_future, user_id in zip(
+                pending, face_futures, hash_futures, user_ids):
+            try:
+                face_encoding = face_pipeline.encoding_result(face_future)
+            except Exception as e:
+                job.fail_row(row_number, user.email, f"Could not read photo: {str(e)}")
+                continue
+            if face_encoding is None:
+                job.fail_row(row_number, user.email, "No face found in the image")
+                continue
+            try:
+                duplicate_of = face_duplicates.check_enrollment(
+                    db, face_encoding, pending=[(new_id, encoding) for _, _, new_id, _, encoding in new_users])
+            except HTTPException as e:
+                job.fail_row(row_number, user.email, e.detail)
+                continue
+            db_user = build_user_with_face(user_id, user, hash_future.result(), face_encoding, duplicate_of)
+            new_users.append((row_number, user.email, user_id, db_user, face_encoding))
+
+        # Stamp at commit time so other workers' gallery syncs see these faces
+        enrolled_at = datetime.utcnow()
+        for _, _, _, db_user, _ in new_users:
+            db_user.face_enrolled_at = enrolled_at
+        try:
+            db.add_all([db_user for _, _, _, db_user, _ in new_users])
+            db.commit()
+            created = new_users
+        except SQLAlchemyError:
+            # Something in the batch clashed; retry row by row to pin down which
+            db.rollback()
+            created = []
+            for entry in new_users:
+                row_number, email, _, db_user, _ = entry
+                try:
+                    db.add(db_user)
+                    db.commit()
+                    created.append(entry)
+                except SQLAlchemyError as e:
+                    db.rollback()
+                    job.fail_row(row_number, email, f"Database error: {str(e)}")
+
+        # Committed rows are expired, so use the values we already hold
+        gallery.add_many((user_id, face_encoding) for _, _, user_id, _, face_encoding in created)
+        job.created += len(created)
+    finally:
+        db.close()
+        job.processed_rows += len(chunk)
+
+
+def _run(job: BulkEnrollmentJob, archive_path: str):
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            if MANIFEST_NAME not in archive.namelist():
+                raise ValueError(f"{MANIFEST_NAME} not found in archive")
+            with archive.open(MANIFEST_NAME) as manifest:
+                rows = list(csv.DictReader(io.TextIOWrapper(manifest, encoding="utf-8-sig")))
+            job.total_rows = len(rows)
+            _save(job)
+
+            # Manifest row 1 is the header
+            numbered = list(enumerate(rows, start=2))
+            for start in range(0, len(numbered), ENROLLMENT_BATCH_SIZE):
+                _process_chunk(job, archive, numbered[start:start + ENROLLMENT_BATCH_SIZE])
+                _save(job)
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.errors.append({"row": 0, "email": None, "detail": str(e)})
+    finally:
+        job.finished_at = datetime.utcnow()
+        os.remove(archive_path)
+        _save(job)
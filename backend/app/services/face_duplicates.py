@@ -0,0 +1,187 @@
+"""Detect one person enrolled under several accounts.
+
+At enrollment, ``check_enrollment`` runs a 1:N search of the new encoding
+against everyone already enrolled, using the stricter
+``FACE_DUPLICATE_TOLERANCE``. ``FACE_DUPLICATE_MODE`` decides what happens on
+a match: ``reject`` refuses the enrollment with 409, ``flag`` enrolls the user
+but records the matching account in ``users.duplicate_of`` for review, and
+``off`` skips the check.
+
+``find_clusters`` scans the whole voter table for faces that are already
+duplicated. Pairwise distances are computed block by block as matrix products,
+so memory stays at ``block_size``² floats and the work is pure BLAS; matching
+pairs are merged into clusters with union-find::
+
+    python -m app.services.face_duplicates --tolerance 0.45 --output clusters.json
+    python -m app.services.face_duplicates --flag
+"""
+import argparse
+import json
+import os
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.services.face_gallery import closest_match
+from app.utils.face_encoding import deserialize_encoding
+
+FACE_DUPLICATE_TOLERANCE = float(os.getenv("FACE_DUPLICATE_TOLERANCE", "0.45"))
+FACE_DUPLICATE_MODE = os.getenv("FACE_DUPLICATE_MODE", "reject").lower()
+
+_LOAD_BATCH = 50000
+_FLAG_BATCH = 1000
+
+
+def check_enrollment(db: Session, encoding: np.ndarray, user_id: Optional[str] = None,
+                     pending: Sequence[tuple[str, np.ndarray]] = ()) -> Optional[str]:
+    """Apply the duplicate policy to a face about to be enrolled.
+
+    ``pending`` holds ``(user_id, encoding)`` pairs enrolled in the same batch
+    that are not in the gallery yet. Raises 409 in ``reject`` mode, otherwise
+    returns the ``user_id`` of the account the face already belongs to (or
+    None) for ``flag`` mode to record.
+    """
+    if FACE_DUPLICATE_MODE == "off":
+        return None
+    matches = []
+    match = closest_match(db, encoding, FACE_DUPLICATE_TOLERANCE)
+    if match and match[0] != user_id:
+        matches.append(match)
+    if pending:
+        distances = np.linalg.norm(np.stack([e for _, e in pending]) - encoding, axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] <= FACE_DUPLICATE_TOLERANCE:
+            matches.append((pending[best][0], float(distances[best])))
+    if not matches:
+        return None
+    match = min(matches, key=lambda m: m[1])
+    if FACE_DUPLICATE_MODE == "reject":
+        raise HTTPException(status_code=409, detail="This face is already enrolled for another account")
+    return match[0]
+
+
+def _load_encodings(db: Session) -> tuple[np.ndarray, list[int], list[str]]:
+    """Every stored encoding as one float32 matrix, plus the matching row PKs and user IDs"""
+    encodings, pks, user_ids = [], [], []
+    last_pk = 0
+    while True:
+        rows = db.query(
+            models.User.id, models.User.user_id, models.User.face_encoding
+        ).filter(
+            models.User.id > last_pk,
+            models.User.face_encoding.isnot(None)
+        ).order_by(models.User.id).limit(_LOAD_BATCH).all()
+        if not rows:
+            break
+        encodings.append(np.stack([deserialize_encoding(blob) for _, _, blob in rows]))
+        pks.extend(pk for pk, _, _ in rows)
+        user_ids.extend(user_id for _, user_id, _ in rows)
+        last_pk = rows[-1].id
+    if not encodings:
+        return np.empty((0, 128), dtype=np.float32), pks, user_ids
+    return np.ascontiguousarray(np.concatenate(encodings), dtype=np.float32), pks, user_ids
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+def find_clusters(encodings: np.ndarray, tolerance: float = FACE_DUPLICATE_TOLERANCE,
+                  block_size: int = 4096) -> list[list[int]]:
+    """Group rows whose encodings lie within tolerance of each other, transitively.
+
+    Returns the clusters with more than one member as lists of row numbers in
+    ascending order.
+    """
+    n = len(encodings)
+    parent = np.arange(n)
+    sq_norms = np.einsum("ij,ij->i", encodings, encodings)
+    threshold = tolerance * tolerance
+
+    for i in range(0, n, block_size):
+        block_i = encodings[i:i + block_size]
+        for j in range(i, n, block_size):
+            block_j = encodings[j:j + block_size]
+            # ||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2, one GEMM per pair of blocks
+            sq_distances = block_i @ block_j.T
+            sq_distances *= -2.0
+            sq_distances += sq_norms[i:i + block_size, None]
+            sq_distances += sq_norms[None, j:j + block_size]
+            rows, cols = np.nonzero(sq_distances <= threshold)
+            if i == j:
+                upper = cols > rows
+                rows, cols = rows[upper], cols[upper]
+            for a, b in zip(rows + i, cols + j):
+                root_a, root_b = _find(parent, int(a)), _find(parent, int(b))
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters: dict[int, list[int]] = {}
+    for row in range(n):
+        clusters.setdefault(_find(parent, row), []).append(row)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def _flag(db: Session, clusters: list[list[int]], pks: list[int], user_ids: list[str]) -> int:
+    """Point every account in a cluster except its oldest at that oldest account"""
+    updates = [
+        {"id": pks[row], "duplicate_of": user_ids[members[0]]}
+        for members in clusters
+        for row in members[1:]
+    ]
+    for start in range(0, len(updates), _FLAG_BATCH):
+        db.bulk_update_mappings(models.User, updates[start:start + _FLAG_BATCH])
+        db.commit()
+    return len(updates)
+
+
+def scan(db: Session, tolerance: float = FACE_DUPLICATE_TOLERANCE, block_size: int = 4096,
+         flag: bool = False) -> dict:
+    """Find duplicate clusters across all enrolled users, optionally flagging them"""
+    start = time.perf_counter()
+    encodings, pks, user_ids = _load_encodings(db)
+    loaded = time.perf_counter()
+    clusters = find_clusters(encodings, tolerance, block_size)
+    report = {
+        "users": len(encodings),
+        "tolerance": tolerance,
+        "clusters": [[user_ids[row] for row in members] for members in clusters],
+        "duplicate_accounts": sum(len(members) - 1 for members in clusters),
+        "load_seconds": round(loaded - start, 2),
+        "scan_seconds": round(time.perf_counter() - loaded, 2),
+    }
+    if flag:
+        report["flagged"] = _flag(db, clusters, pks, user_ids)
+    return report
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Find faces enrolled under more than one account")
+    parser.add_argument("--tolerance", type=float, default=FACE_DUPLICATE_TOLERANCE)
+    parser.add_argument("--block-size", type=int, default=4096)
+    parser.add_argument("--flag", action="store_true", help="record duplicates in users.duplicate_of")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = scan(db, tolerance=args.tolerance, block_size=args.block_size, flag=args.flag)
+    finally:
+        db.close()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
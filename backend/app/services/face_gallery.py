@@ -0,0 +1,187 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.services.face_index import get_index
+from app.utils.face_encoding import deserialize_encoding
+
+FACE_SYNC_OVERLAP = float(os.getenv("FACE_SYNC_OVERLAP", "120"))
+
+ENCODING_DIM = 128
+_INITIAL_CAPACITY = 1024
+_FETCH_BATCH = 500
+_EPOCH = datetime(1970, 1, 1)
+
+
+class FaceGallery:
+    """In-memory matrix of enrolled face encodings for 1:N identification.
+
+    Rows are kept in one contiguous array next to a parallel array of
+    ``user_id``s so a lookup is a single matrix-vector product instead of a
+    Python loop over users. Enrollments made by this process are appended in
+    place, and faces written by other workers, whether on new or existing
+    accounts, are picked up by ``sync`` from ``users.face_enrolled_at``, so the
+    table is only read in full once per process. Each sync re-reads the last
+    ``FACE_SYNC_OVERLAP`` seconds of stamps, which covers faces that commit
+    after a later-stamped one and clock skew between hosts up to that window.
+    """
+
+    def __init__(self, dim: int = ENCODING_DIM):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._encodings = np.empty((0, dim), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float64)
+        self._user_ids = np.empty(0, dtype=object)
+        self._positions: dict[str, int] = {}
+        self._size = 0
+        self._enrolled_at: dict[str, Optional[datetime]] = {}
+        self._synced_to: Optional[datetime] = None
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self, needed: int):
+        capacity = self._encodings.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, _INITIAL_CAPACITY)
+        encodings = np.empty((new_capacity, self.dim), dtype=self._encodings.dtype)
+        sq_norms = np.empty(new_capacity, dtype=np.float64)
+        user_ids = np.empty(new_capacity, dtype=object)
+        encodings[:self._size] = self._encodings[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        user_ids[:self._size] = self._user_ids[:self._size]
+        self._encodings, self._sq_norms, self._user_ids = encodings, sq_norms, user_ids
+
+    def _add_locked(self, user_id: str, encoding: np.ndarray):
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        position = self._positions.get(user_id)
+        if position is None:
+            self._grow(self._size + 1)
+            position = self._size
+            self._size += 1
+            self._positions[user_id] = position
+            self._user_ids[position] = user_id
+        self._encodings[position] = encoding
+        self._sq_norms[position] = float(encoding @ encoding)
+
+    def add(self, user_id: str, encoding: np.ndarray):
+        """Add or replace the encoding enrolled for a user"""
+        with self._lock:
+            self._add_locked(user_id, encoding)
+
+    def add_many(self, rows):
+        """Add ``(user_id, encoding)`` pairs in one locked pass"""
+        with self._lock:
+            for user_id, encoding in rows:
+                self._add_locked(user_id, encoding)
+
+    def __contains__(self, user_id: str):
+        return user_id in self._positions
+
+    def start_from(self, watermark: Optional[datetime]):
+        """Skip faces stamped before watermark, e.g. because a prebuilt index holds them.
+
+        Only takes effect before the first sync; a gallery that already holds
+        the whole table keeps it.
+        """
+        with self._lock:
+            if self._synced_to is None and watermark is not None:
+                self._synced_to = watermark
+
+    def _load_locked(self, rows):
+        """Add ``(user_id, face_enrolled_at, blob)`` rows and advance the sync mark"""
+        self._grow(self._size + len(rows))
+        synced_to = self._synced_to or _EPOCH
+        for user_id, enrolled_at, blob in rows:
+            self._add_locked(user_id, deserialize_encoding(blob))
+            self._enrolled_at[user_id] = enrolled_at
+            if enrolled_at is not None:
+                synced_to = max(synced_to, enrolled_at)
+        self._synced_to = synced_to
+
+    def sync(self, db: Session):
+        """Load faces enrolled or replaced since the last sync (the whole table on first use)"""
+        since = self._synced_to
+        if since is None:
+            rows = db.query(
+                models.User.user_id, models.User.face_enrolled_at, models.User.face_encoding
+            ).filter(models.User.face_encoding.isnot(None)).all()
+            with self._lock:
+                self._load_locked(rows)
+            return
+
+        stamps = db.query(models.User.user_id, models.User.face_enrolled_at).filter(
+            models.User.face_encoding.isnot(None),
+            models.User.face_enrolled_at > since - timedelta(seconds=FACE_SYNC_OVERLAP)
+        ).all()
+        # Only fetch the encodings this process hasn't seen at that stamp yet
+        changed = [user_id for user_id, enrolled_at in stamps
+                   if user_id not in self._enrolled_at or self._enrolled_at[user_id] != enrolled_at]
+        for start in range(0, len(changed), _FETCH_BATCH):
+            rows = db.query(
+                models.User.user_id, models.User.face_enrolled_at, models.User.face_encoding
+            ).filter(
+                models.User.user_id.in_(changed[start:start + _FETCH_BATCH]),
+                models.User.face_encoding.isnot(None)
+            ).all()
+            with self._lock:
+                self._load_locked(rows)
+
+    def best_match(self, encoding: np.ndarray, tolerance: float = 0.6) -> Optional[tuple[str, float]]:
+        """Return ``(user_id, distance)`` of the closest face within tolerance"""
+        with self._lock:
+            size = self._size
+            encodings = self._encodings[:size]
+            sq_norms = self._sq_norms[:size]
+            user_ids = self._user_ids[:size]
+        if size == 0:
+            return None
+
+        query = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        # ||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2, one GEMV for the whole gallery
+        sq_distances = sq_norms - 2.0 * (encodings @ query) + float(query @ query)
+        best = int(np.argmin(sq_distances))
+        distance = float(np.sqrt(max(sq_distances[best], 0.0)))
+        if distance > tolerance:
+            return None
+        return user_ids[best], distance
+
+
+gallery = FaceGallery()
+
+
+def closest_match(db: Session, encoding: np.ndarray, tolerance: float = 0.6) -> Optional[tuple[str, float]]:
+    """Return ``(user_id, distance)`` of the enrolled face closest to the encoding.
+
+    When a face index is configured it answers for faces stamped before it was
+    built and the gallery only holds faces written since. A user whose face
+    was replaced after the build is answered by the gallery alone, so their
+    old encoding in the index can't match.
+    """
+    index = get_index()
+    if index is not None:
+        gallery.start_from(index.face_watermark)
+    gallery.sync(db)
+
+    matches = []
+    match = gallery.best_match(encoding, tolerance)
+    if match:
+        matches.append(match)
+    if index is not None:
+        # Exact distances of the top candidates decide, as in exhaustive search
+        matches.extend(m for m in index.search(encoding, k=10) if m[1] <= tolerance and m[0] not in gallery)
+    if not matches:
+        return None
+    return min(matches, key=lambda m: m[1])
+
+
+def identify(db: Session, encoding: np.ndarray, tolerance: float = 0.6) -> Optional[str]:
+    """Find the enrolled user whose face best matches the encoding"""
+    match = closest_match(db, encoding, tolerance)
+    return match[0] if match else None
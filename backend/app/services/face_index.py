@@ -0,0 +1,270 @@
+"""Inverted-file (IVF) index for 1:N face identification.
+
+The index partitions enrolled encodings into coarse k-means cells. A query only
+scans the ``nprobe`` cells whose centroids are closest to it, then re-ranks the
+candidates by exact euclidean distance so the usual tolerance check decides
+accept/reject. The index is written as plain ``.npy`` files that every uvicorn
+worker memory-maps, so the OS page cache holds a single copy.
+
+Build it offline and point ``FACE_INDEX_PATH`` at the directory. Workers check
+``meta.json`` every ``FACE_INDEX_RELOAD_SECONDS`` and map a rebuilt index
+without a restart::
+
+    python -m app.services.face_index build --path /var/lib/votevision/face-index
+    python -m app.services.face_index report --path /var/lib/votevision/face-index
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.utils.face_encoding import deserialize_encoding
+
+FACE_INDEX_PATH = os.getenv("FACE_INDEX_PATH")
+FACE_INDEX_NPROBE = int(os.getenv("FACE_INDEX_NPROBE", "16"))
+FACE_INDEX_RELOAD_SECONDS = float(os.getenv("FACE_INDEX_RELOAD_SECONDS", "60"))
+
+_CHUNK = 65536
+_TRAIN_POINTS_PER_LIST = 256
+
+
+def _nearest_centroid(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Assign each row of data to its closest centroid"""
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    assignment = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), _CHUNK):
+        chunk = data[start:start + _CHUNK]
+        assignment[start:start + _CHUNK] = np.argmin(c_sq - 2.0 * chunk @ centroids.T, axis=1)
+    return assignment
+
+
+def _train_centroids(data: np.ndarray, n_lists: int, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain Lloyd k-means on a bounded sample of the data"""
+    sample_size = min(len(data), n_lists * _TRAIN_POINTS_PER_LIST)
+    sample = data[rng.choice(len(data), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignment = _nearest_centroid(sample, centroids)
+        counts = np.bincount(assignment, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Reseed empty cells so every list stays useful
+        if empty.any():
+            centroids[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+    return centroids
+
+
+class FaceIndex:
+    """Memory-mapped IVF index loaded from a directory written by ``build_index``"""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.user_ids = np.load(os.path.join(path, "user_ids.npy"), mmap_mode="r")
+        self._c_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    @property
+    def face_watermark(self) -> Optional[datetime]:
+        """Latest ``users.face_enrolled_at`` included when the index was built"""
+        watermark = self.meta.get("face_watermark")
+        return datetime.fromisoformat(watermark) if watermark else None
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def search(self, encoding: np.ndarray, k: int = 10, nprobe: int = FACE_INDEX_NPROBE) -> list[tuple[str, float]]:
+        """Return up to k ``(user_id, distance)`` pairs, nearest first"""
+        query = np.asarray(encoding, dtype=np.float32).reshape(-1)
+        n_lists = len(self.centroids)
+        nprobe = min(nprobe, n_lists)
+
+        centroid_distances = self._c_sq - 2.0 * (self.centroids @ query)
+        if nprobe < n_lists:
+            probe = np.argpartition(centroid_distances, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(n_lists)
+
+        positions = []
+        distances = []
+        for cell in probe:
+            start, end = int(self.offsets[cell]), int(self.offsets[cell + 1])
+            if start == end:
+                continue
+            diff = self.vectors[start:end] - query
+            distances.append(np.sqrt(np.einsum("ij,ij->i", diff, diff)))
+            positions.append(np.arange(start, end))
+        if not distances:
+            return []
+
+        positions = np.concatenate(positions)
+        distances = np.concatenate(distances)
+        if k < len(distances):
+            top = np.argpartition(distances, k - 1)[:k]
+        else:
+            top = np.arange(len(distances))
+        top = top[np.argsort(distances[top])]
+        return [(str(self.user_ids[positions[i]]), float(distances[i])) for i in top]
+
+
+def build_index(db: Session, path: str, n_lists: Optional[int] = None, n_iter: int = 20, seed: int = 0) -> dict:
+    """Build the index from ``User.face_encoding`` and atomically swap it into path"""
+    rows = db.query(
+        models.User.user_id, models.User.face_enrolled_at, models.User.face_encoding
+    ).filter(
+        models.User.face_encoding.isnot(None)
+    ).order_by(models.User.id).all()
+    if not rows:
+        raise ValueError("No face encodings to index")
+
+    data = np.stack([deserialize_encoding(blob) for _, _, blob in rows])
+    user_ids = np.array([user_id for user_id, _, _ in rows])
+    watermark = max((enrolled_at for _, enrolled_at, _ in rows if enrolled_at is not None), default=None)
+    if n_lists is None:
+        n_lists = int(4 * np.sqrt(len(data)))
+    n_lists = max(1, min(n_lists, len(data)))
+
+    rng = np.random.default_rng(seed)
+    centroids = _train_centroids(data, n_lists, n_iter, rng)
+    assignment = _nearest_centroid(data, centroids)
+    order = np.argsort(assignment, kind="stable")
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+
+    meta = {
+        "count": len(data),
+        "dim": data.shape[1],
+        "n_lists": n_lists,
+        "face_watermark": watermark.isoformat() if watermark else None,
+        "built_at": datetime.utcnow().isoformat(),
+    }
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "centroids.npy"), centroids)
+    np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp_path, "vectors.npy"), np.ascontiguousarray(data[order]))
+    np.save(os.path.join(tmp_path, "user_ids.npy"), user_ids[order])
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # Workers that already mapped the old files keep reading them until reload
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return meta
+
+
+_index: Optional[FaceIndex] = None
+_index_lock = threading.Lock()
+_index_mtime: Optional[int] = None
+_index_checked_at: Optional[float] = None
+
+
+def get_index() -> Optional[FaceIndex]:
+    """Return the configured index, remapping it when a rebuild has replaced it"""
+    global _index, _index_mtime, _index_checked_at
+    if not FACE_INDEX_PATH:
+        return None
+    now = time.monotonic()
+    if _index_checked_at is not None and now - _index_checked_at < FACE_INDEX_RELOAD_SECONDS:
+        return _index
+    with _index_lock:
+        if _index_checked_at is None or now - _index_checked_at >= FACE_INDEX_RELOAD_SECONDS:
+            try:
+                mtime = os.stat(os.path.join(FACE_INDEX_PATH, "meta.json")).st_mtime_ns
+                if mtime != _index_mtime:
+                    _index, _index_mtime = FaceIndex(FACE_INDEX_PATH), mtime
+            except FileNotFoundError:
+                # Missing or mid-swap; keep serving the index already mapped
+                pass
+            _index_checked_at = now
+    return _index
+
+
+def recall_report(index: FaceIndex, n_queries: int = 1000, ks=(1, 10), noise: float = 0.02,
+                  nprobe: int = FACE_INDEX_NPROBE, seed: int = 0) -> dict:
+    """Compare recall@k and latency of the index against exhaustive search.
+
+    Queries are enrolled encodings with gaussian noise added, which mimics a
+    fresh capture of an enrolled voter.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(index.vectors)
+    sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+    picks = rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0.0, noise, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    max_k = max(ks)
+
+    hits = {k: 0 for k in ks}
+    exact_times = []
+    ann_times = []
+    for query in queries:
+        start = time.perf_counter()
+        sq_distances = sq_norms - 2.0 * (vectors @ query)
+        truth = np.argpartition(sq_distances, max_k - 1)[:max_k] if max_k < len(vectors) else np.arange(len(vectors))
+        truth = truth[np.argsort(sq_distances[truth])]
+        exact_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        found = index.search(query, k=max_k, nprobe=nprobe)
+        ann_times.append(time.perf_counter() - start)
+
+        found_ids = [user_id for user_id, _ in found]
+        for k in ks:
+            truth_ids = {str(index.user_ids[i]) for i in truth[:k]}
+            hits[k] += len(truth_ids.intersection(found_ids[:k])) / len(truth_ids)
+
+    def latency(samples):
+        ms = np.array(samples) * 1000.0
+        return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99))}
+
+    return {
+        "count": len(vectors),
+        "n_lists": int(index.meta["n_lists"]),
+        "nprobe": nprobe,
+        "queries": len(queries),
+        "recall": {f"recall@{k}": hits[k] / len(queries) for k in ks},
+        "exhaustive": latency(exact_times),
+        "ivf": latency(ann_times),
+    }
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Build or evaluate the face IVF index")
+    parser.add_argument("command", choices=["build", "report"])
+    parser.add_argument("--path", default=FACE_INDEX_PATH, required=FACE_INDEX_PATH is None)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=FACE_INDEX_NPROBE)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        db = SessionLocal()
+        try:
+            print(json.dumps(build_index(db, args.path, n_lists=args.lists), indent=2))
+        finally:
+            db.close()
+    else:
+        report = recall_report(FaceIndex(args.path), n_queries=args.queries, nprobe=args.nprobe)
+        print(json.dumps(report, indent=2))
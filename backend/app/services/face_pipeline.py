@@ -0,0 +1,330 @@
+"""Face decode/detect/encode pipeline run in a pool of worker processes.
+
+dlib holds the GIL while it works, so running it inside request handlers
+stalls the event loop and every other threadpool worker. Images are handed to
+a ``ProcessPoolExecutor`` instead; each worker loads the dlib models once when
+it starts. ``FACE_WORKERS=0`` runs the pipeline inline, which is handy for
+local development.
+
+HOG detection dominates the cost on large photos, so faces are detected on a
+copy downscaled to ``FACE_DETECT_MAX_DIM`` and only a crop of the original
+around the detected box is used for landmarks and the encoding. Only the
+largest face in the photo is encoded, so bystanders cost nothing extra.
+
+The landmark model (``small`` 5-point or ``large`` 68-point) and the number of
+jitters are chosen per use through ``FACE_<PROFILE>_MODEL`` and
+``FACE_<PROFILE>_JITTERS`` for the ``enroll``, ``login`` and ``verify``
+profiles, e.g. accurate settings for enrollment and the cheapest ones for kiosk
+verification.
+
+Clients that time out tend to resend the very same photo, so results for the
+profiles in ``FACE_CACHE_PROFILES`` (login and verify by default) are cached
+for ``FACE_CACHE_TTL`` seconds under a BLAKE2b hash of the uploaded bytes,
+including photos where no face was found. ``FACE_CACHE_MAX_BYTES`` caps the
+memory the cache may use.
+
+Uploads are read in chunks and refused with ``413`` past ``MAX_UPLOAD_BYTES``.
+Photos larger than ``FACE_WORK_MAX_DIM`` are brought down to that working
+resolution while decoding; JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale
+through PIL's draft mode, so the full-size bitmap never exists.
+"""
+import asyncio
+import hashlib
+import io
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import face_recognition
+import numpy as np
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+
+from app.core.metrics import Histogram
+from app.utils.ttl_cache import TTLCache
+
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", str(os.cpu_count() or 1)))
+FACE_DETECT_MAX_DIM = int(os.getenv("FACE_DETECT_MAX_DIM", "800"))
+FACE_WORK_MAX_DIM = int(os.getenv("FACE_WORK_MAX_DIM", "1600"))
+FACE_STREAM_WINDOW = int(os.getenv("FACE_STREAM_WINDOW", str(max(1, FACE_WORKERS * 2))))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+_UPLOAD_CHUNK = 64 * 1024
+# Context kept around the detected box so the landmark model sees the whole face
+_CROP_MARGIN = 0.25
+
+
+class FaceOptions(NamedTuple):
+    model: str = "small"
+    num_jitters: int = 1
+
+
+def _profile(name: str) -> FaceOptions:
+    prefix = f"FACE_{name.upper()}_"
+    return FaceOptions(
+        model=os.getenv(prefix + "MODEL", "small"),
+        num_jitters=int(os.getenv(prefix + "JITTERS", "1")),
+    )
+
+
+PROFILES = {name: _profile(name) for name in ("enroll", "login", "verify")}
+
+FACE_CACHE_PROFILES = {
+    name.strip() for name in os.getenv("FACE_CACHE_PROFILES", "login,verify").split(",") if name.strip()
+}
+# Marks a cached photo in which no face was found
+_NO_FACE = object()
+_CACHE_ENTRY_OVERHEAD = 200
+
+_results = TTLCache(
+    "face_pipeline_results",
+    maxsize=int(os.getenv("FACE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("FACE_CACHE_TTL", "60")),
+    max_bytes=int(os.getenv("FACE_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    sizeof=lambda value: _CACHE_ENTRY_OVERHEAD + getattr(value, "nbytes", 0),
+)
+
+stage_seconds = Histogram(
+    "face_pipeline_stage_seconds",
+    "Time spent in each stage of the face pipeline",
+    ["stage"],
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _warm_up():
+    """Load the dlib models in a fresh worker process"""
+    face_recognition.face_encodings(np.zeros((32, 32, 3), dtype=np.uint8))
+
+
+def _ping():
+    return os.getpid()
+
+
+def _decode(data: bytes) -> Image.Image:
+    """Decode an image as RGB at no more than FACE_WORK_MAX_DIM on its long side"""
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    scale = FACE_WORK_MAX_DIM / max(width, height)
+    if scale < 1.0:
+        # Only JPEG honours this; it picks the smallest scale still >= the requested size
+        image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    width, height = image.size
+    scale = FACE_WORK_MAX_DIM / max(width, height)
+    if scale < 1.0:
+        image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR)
+    return image
+
+
+def _detect(image: Image.Image) -> list[tuple[int, int, int, int]]:
+    """Detect faces on a downscaled copy and return boxes in original coordinates"""
+    width, height = image.size
+    scale = min(1.0, FACE_DETECT_MAX_DIM / max(width, height))
+    if scale < 1.0:
+        small = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR)
+    else:
+        small = image
+    boxes = face_recognition.face_locations(np.asarray(small))
+    return [
+        (
+            max(0, int(top / scale)),
+            min(width, int(right / scale)),
+            min(height, int(bottom / scale)),
+            max(0, int(left / scale)),
+        )
+        for top, right, bottom, left in boxes
+    ]
+
+
+def _largest(boxes: list[tuple[int, int, int, int]]) -> tuple[int, int, int, int]:
+    return max(boxes, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+
+
+def _encode_box(image: Image.Image, box: tuple[int, int, int, int], options: FaceOptions) -> np.ndarray:
+    """Compute the encoding for one box using only a crop of the image"""
+    width, height = image.size
+    top, right, bottom, left = box
+    margin_y = int((bottom - top) * _CROP_MARGIN)
+    margin_x = int((right - left) * _CROP_MARGIN)
+    crop_left, crop_top = max(0, left - margin_x), max(0, top - margin_y)
+    crop_right, crop_bottom = min(width, right + margin_x), min(height, bottom + margin_y)
+    crop = np.asarray(image.crop((crop_left, crop_top, crop_right, crop_bottom)))
+    location = (top - crop_top, right - crop_left, bottom - crop_top, left - crop_left)
+    return face_recognition.face_encodings(
+        crop, known_face_locations=[location], num_jitters=options.num_jitters, model=options.model)[0]
+
+
+def process_image_bytes(data: bytes, options: FaceOptions = FaceOptions()) -> tuple[Optional[np.ndarray], dict]:
+    """Decode an image and encode its largest face, with per-stage timings"""
+    timings = {}
+    start = time.perf_counter()
+    image = _decode(data)
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    boxes = _detect(image)
+    timings["detect"] = time.perf_counter() - start
+    if not boxes:
+        return None, timings
+
+    start = time.perf_counter()
+    encoding = _encode_box(image, _largest(boxes), options)
+    timings["encode"] = time.perf_counter() - start
+    return encoding, timings
+
+
+def _record(result: tuple[Optional[np.ndarray], dict]) -> Optional[np.ndarray]:
+    encoding, timings = result
+    for stage, seconds in timings.items():
+        stage_seconds.observe(seconds, stage=stage)
+    return encoding
+
+
+def _cache_key(data: bytes, profile: str):
+    if profile not in FACE_CACHE_PROFILES:
+        return None
+    return profile, hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _remember(key, encoding: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    if key is not None:
+        if encoding is not None:
+            # Later hits hand out this same array
+            encoding.setflags(write=False)
+        _results.set(key, _NO_FACE if encoding is None else encoding)
+    return encoding
+
+
+def _too_large():
+    return HTTPException(status_code=413, detail=f"Image is larger than {MAX_UPLOAD_BYTES} bytes")
+
+
+def read_upload(image_file: UploadFile) -> bytes:
+    """Read an upload in chunks, refusing it as soon as it passes MAX_UPLOAD_BYTES"""
+    if image_file.size is not None and image_file.size > MAX_UPLOAD_BYTES:
+        raise _too_large()
+    buffer = bytearray()
+    while chunk := image_file.file.read(_UPLOAD_CHUNK):
+        buffer += chunk
+        if len(buffer) > MAX_UPLOAD_BYTES:
+            raise _too_large()
+    return bytes(buffer)
+
+
+async def read_upload_async(image_file: UploadFile) -> bytes:
+    """read_upload for async handlers"""
+    if image_file.size is not None and image_file.size > MAX_UPLOAD_BYTES:
+        raise _too_large()
+    buffer = bytearray()
+    while chunk := await image_file.read(_UPLOAD_CHUNK):
+        buffer += chunk
+        if len(buffer) > MAX_UPLOAD_BYTES:
+            raise _too_large()
+    return bytes(buffer)
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """Return the shared worker pool, or None when the pipeline runs inline"""
+    global _executor
+    if FACE_WORKERS <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn, not fork: the parent has threads and open DB connections
+                _executor = ProcessPoolExecutor(
+                    max_workers=FACE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+    return _executor
+
+
+def start():
+    """Start every worker up front so the first requests don't pay for model loading"""
+    executor = get_executor()
+    if executor is not None:
+        for future in [executor.submit(_ping) for _ in range(FACE_WORKERS)]:
+            future.result()
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+def encode_upload(image_file: UploadFile, profile: str) -> Optional[np.ndarray]:
+    """Encode an uploaded image from a sync handler"""
+    data = read_upload(image_file)
+    key = _cache_key(data, profile)
+    cached = _results.get(key) if key is not None else None
+    if cached is not None:
+        return None if cached is _NO_FACE else cached
+
+    options = PROFILES[profile]
+    executor = get_executor()
+    if executor is None:
+        return _remember(key, _record(process_image_bytes(data, options)))
+    return _remember(key, _record(executor.submit(process_image_bytes, data, options).result()))
+
+
+async def encode_upload_async(image_file: UploadFile, profile: str) -> Optional[np.ndarray]:
+    """Encode an uploaded image without blocking the event loop"""
+    data = await read_upload_async(image_file)
+    key = _cache_key(data, profile)
+    cached = _results.get(key) if key is not None else None
+    if cached is not None:
+        return None if cached is _NO_FACE else cached
+
+    options = PROFILES[profile]
+    executor = get_executor()
+    if executor is None:
+        return _remember(key, _record(await run_in_threadpool(process_image_bytes, data, options)))
+    return _remember(key, _record(await asyncio.get_running_loop().run_in_executor(
+        executor, process_image_bytes, data, options)))
+
+
+def submit_stream(images: Iterable[bytes], profile: str) -> Iterator[Future]:
+    """Queue images on the worker pool in order, one future per image.
+
+    At most ``FACE_STREAM_WINDOW`` images are in flight: the next one is only
+    pulled from ``images`` once the caller takes a future, so reading photos
+    lazily keeps just that many in memory. ``encoding_result`` turns a future
+    into the encoding (or None), re-raising any decode error for that image
+    only.
+    """
+    options = PROFILES[profile]
+    executor = get_executor()
+    if executor is None:
+        for data in images:
+            future = Future()
+            try:
+                future.set_result(process_image_bytes(data, options))
+            except Exception as e:
+                future.set_exception(e)
+            yield future
+        return
+
+    in_flight = deque()
+    for data in images:
+        in_flight.append(executor.submit(process_image_bytes, data, options))
+        if len(in_flight) >= FACE_STREAM_WINDOW:
+            yield in_flight.popleft()
+    while in_flight:
+        yield in_flight.popleft()
+
+
+def encoding_result(future: Future) -> Optional[np.ndarray]:
+    return _record(future.result())
@@ -0,0 +1,110 @@
+"""Collision-free allocation of 6-character user, candidate and election IDs.
+
+Each kind of ID has a row in ``id_sequences``. A process leases a block of
+``ID_BLOCK_SIZE`` sequence values with one atomic update, then hands out IDs
+from it in memory. Every lease is a disjoint range, so workers never clash.
+Values are mapped through a fixed permutation of the 36^6 space
+(``sequence_to_id``), so IDs keep the old format and still look random. IDs
+drawn at random before the allocator existed may land anywhere in that space,
+so each leased block is checked against its table once and any value already
+taken is skipped.
+
+A lease runs on the caller's session, in a savepoint of its transaction, so it
+never needs a second pooled connection. IDs the caller leaves over are shared
+with other callers only once that transaction commits; if it rolls back, the
+lease is undone and they are dropped.
+"""
+import os
+import threading
+
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.utils.id_generator import sequence_to_id
+
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "500"))
+
+# Session.info key for leftovers of leases made in the session's transaction
+_UNCOMMITTED = "id_allocator.uncommitted"
+
+
+class BlockAllocator:
+    def __init__(self, name: str, column, block_size: int = ID_BLOCK_SIZE):
+        self.name = name
+        self.column = column
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._free: list[str] = []
+
+    def next_id(self, db: Session) -> str:
+        return self.take(db, 1)[0]
+
+    def take(self, db: Session, count: int) -> list[str]:
+        """Allocate count IDs, leasing more blocks on db as needed"""
+        with self._lock:
+            if len(self._free) >= count:
+                taken, self._free = self._free[:count], self._free[count:]
+                return taken
+            taken, self._free = self._free, []
+        # Lease outside the lock: the update may wait for another
+        # transaction's lease to commit
+        while len(taken) < count:
+            taken.extend(self._lease(db))
+        db.info.setdefault(_UNCOMMITTED, []).append((self, taken[count:]))
+        return taken[:count]
+
+    def _release(self, ids: list[str]):
+        with self._lock:
+            self._free.extend(ids)
+
+    def _lease(self, db: Session) -> list[str]:
+        while True:
+            try:
+                with db.begin_nested():
+                    leased = db.execute(
+                        update(models.IdSequence)
+                        .where(models.IdSequence.name == self.name)
+                        .values(next_value=models.IdSequence.next_value + self.block_size)
+                    ).rowcount
+                    if not leased:
+                        # First lease ever; another worker may be creating the row too
+                        db.add(models.IdSequence(name=self.name, next_value=self.block_size))
+                        db.flush()
+                    end = db.query(models.IdSequence.next_value).filter(
+                        models.IdSequence.name == self.name).scalar()
+                break
+            except IntegrityError:
+                continue
+
+        ids = [sequence_to_id(value) for value in range(end - self.block_size, end)]
+        legacy = {
+            existing for (existing,) in
+            db.query(self.column).filter(self.column.in_(ids))
+        }
+        return [new_id for new_id in ids if new_id not in legacy]
+
+
+@event.listens_for(Session, "after_commit")
+def _release_leftovers(session):
+    if session.get_nested_transaction() is None:
+        for allocator, ids in session.info.pop(_UNCOMMITTED, ()):
+            allocator._release(ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_leftovers(session):
+    # Also on a savepoint rollback: it may have undone one of the leases
+    session.info.pop(_UNCOMMITTED, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_unreleased(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_UNCOMMITTED, None)
+
+
+user_ids = BlockAllocator("users", models.User.user_id)
+candidate_ids = BlockAllocator("candidates", models.Candidate.candidate_id)
+election_ids = BlockAllocator("elections", models.Election.election_id)
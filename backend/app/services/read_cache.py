@@ -0,0 +1,99 @@
+"""Versioned cache of serialized election and candidate reads, served with ETags.
+
+Every admin change to elections or candidates calls ``bump(db)`` in its own
+transaction, which moves the cache to a new version so older entries are
+never read again. The version is the single row of ``read_cache_version``,
+shared by all workers, and each cached read looks it up first, so no worker
+serves or confirms data from before a committed change. Responses carry a strong ETag
+computed from the body, so clients revalidating with ``If-None-Match`` get
+``304 Not Modified`` for the cost of that one lookup.
+"""
+import hashlib
+import json
+import os
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.utils.pagination import NEXT_CURSOR_HEADER, Page
+from app.utils.ttl_cache import TTLCache
+
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "10"))
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "1024"))
+
+_cache = TTLCache("read", maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL)
+
+
+def _version_query():
+    return select(models.ReadCacheVersion.version).where(models.ReadCacheVersion.id == 1)
+
+
+def current_version(db: Session) -> int:
+    return db.execute(_version_query()).scalar() or 0
+
+
+async def current_version_async(db: AsyncSession) -> int:
+    return (await db.execute(_version_query())).scalar() or 0
+
+
+def bump(db: Session):
+    """Invalidate every cached read once the caller commits its admin change"""
+    db.query(models.ReadCacheVersion).filter(models.ReadCacheVersion.id == 1).update(
+        {models.ReadCacheVersion.version: models.ReadCacheVersion.version + 1}, synchronize_session=False)
+
+
+def _store(version_key: tuple, payload) -> tuple[str, bytes, Optional[str]]:
+    next_cursor = None
+    if isinstance(payload, Page):
+        payload, next_cursor = payload
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha256(body + (next_cursor or "").encode()).hexdigest()[:32] + '"'
+    entry = (etag, body, next_cursor)
+    _cache.set(version_key, entry)
+    return entry
+
+
+def get_or_load(db: Session, key: tuple, loader: Callable) -> tuple[str, bytes, Optional[str]]:
+    """Return (etag, json body, next page cursor) for key, calling loader on a miss"""
+    version_key = (current_version(db),) + key
+    entry = _cache.get(version_key)
+    if entry is None:
+        entry = _store(version_key, loader())
+    return entry
+
+
+async def get_or_load_async(db: AsyncSession, key: tuple,
+                            loader: Callable[[], Awaitable]) -> tuple[str, bytes, Optional[str]]:
+    """get_or_load on an AsyncSession, awaiting loader on a miss"""
+    version_key = (await current_version_async(db),) + key
+    entry = _cache.get(version_key)
+    if entry is None:
+        entry = _store(version_key, await loader())
+    return entry
+
+
+def _response(request: Request, entry: tuple[str, bytes, Optional[str]]) -> Response:
+    etag, body, next_cursor = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_response(request: Request, db: Session, key: tuple, loader: Callable) -> Response:
+    """Serve a cached JSON read, or 304 when the client already has it"""
+    return _response(request, get_or_load(db, key, loader))
+
+
+async def cached_response_async(request: Request, db: AsyncSession, key: tuple,
+                                loader: Callable[[], Awaitable]) -> Response:
+    """cached_response on an AsyncSession"""
+    return _response(request, await get_or_load_async(db, key, loader))
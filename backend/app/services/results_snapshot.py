@@ -0,0 +1,111 @@
+"""Immutable result snapshots of completed elections.
+
+Once an election has ended its votes can no longer change, so the tallies,
+winner and turnout are computed a single time and stored in
+``election_result_snapshots`` with a SHA-256 of the canonical JSON. Reads are
+answered from an in-process cache of the parsed snapshot; ``RESULTS_CACHE_TTL``
+only bounds how long another worker keeps serving results of an election that
+was deleted.
+"""
+import hashlib
+import json
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import models, schemas
+from app.utils.ttl_cache import TTLCache
+
+# Cached for elections that ended without a single vote
+_NO_VOTES = object()
+
+_summaries = TTLCache(
+    "election_results",
+    maxsize=int(os.getenv("RESULTS_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("RESULTS_CACHE_TTL", "300")),
+)
+
+
+def build_snapshot(db: Session, election_id: str) -> models.ElectionResultSnapshot:
+    """Aggregate the votes of an election into an unsaved snapshot"""
+    vote_count = func.count(models.Vote.vote_id)
+    rows = db.query(
+        models.Candidate.candidate_id,
+        models.Candidate.name,
+        models.Candidate.party,
+        vote_count.label("vote_count")
+    ).join(
+        models.Vote,
+        models.Vote.candidate_id == models.Candidate.candidate_id
+    ).filter(
+        models.Vote.election_id == election_id
+    ).group_by(
+        models.Candidate.candidate_id,
+        models.Candidate.name,
+        models.Candidate.party
+    ).all()
+    # A fixed order keeps the JSON, and so the hash, reproducible
+    rows = sorted(rows, key=lambda row: (-row.vote_count, row.candidate_id))
+
+    results = [{"name": row.name, "party": row.party, "vote_count": int(row.vote_count)} for row in rows]
+    summary = {
+        "results": results,
+        "winner": results[0] if results else None,
+        "turnout": sum(result["vote_count"] for result in results),
+    }
+    body = json.dumps(summary, sort_keys=True, separators=(",", ":"))
+    return models.ElectionResultSnapshot(
+        election_id=election_id,
+        summary=body,
+        content_hash=hashlib.sha256(body.encode()).hexdigest(),
+        winner_candidate_id=rows[0].candidate_id if rows else None,
+        turnout=summary["turnout"],
+    )
+
+
+def create_snapshot(db: Session, election_id: str) -> models.ElectionResultSnapshot:
+    """Store the snapshot of an election that ended without one"""
+    snapshot = build_snapshot(db, election_id)
+    db.add(snapshot)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Someone else stored it first; theirs is the same data
+        db.rollback()
+        snapshot = db.query(models.ElectionResultSnapshot).filter(
+            models.ElectionResultSnapshot.election_id == election_id).one()
+    return snapshot
+
+
+def load_snapshot(db: Session, election_id: str) -> Optional[models.ElectionResultSnapshot]:
+    return db.query(models.ElectionResultSnapshot).filter(
+        models.ElectionResultSnapshot.election_id == election_id).first()
+
+
+def remember(snapshot: models.ElectionResultSnapshot):
+    """Cache the summary of a snapshot"""
+    data = json.loads(snapshot.summary)
+    summary = schemas.VoteSummary(**data) if data["results"] else _NO_VOTES
+    _summaries.set(snapshot.election_id, summary)
+    return summary
+
+
+def cached_summary(db: Session, election_id: str) -> Optional[schemas.VoteSummary]:
+    """Return the results of an ended election, or None if it has no snapshot yet"""
+    summary = _summaries.get(election_id)
+    if summary is None:
+        snapshot = load_snapshot(db, election_id)
+        if snapshot is None:
+            return None
+        summary = remember(snapshot)
+    if summary is _NO_VOTES:
+        raise HTTPException(status_code=404, detail="No votes found for this election")
+    return summary
+
+
+def forget(election_id: str):
+    _summaries.pop(election_id)
@@ -0,0 +1,147 @@
+"""Live turnout and results pushed to dashboards over Server-Sent Events.
+
+Each election being watched has one ``ElectionFeed`` that polls the tally
+counters every ``RESULTS_STREAM_INTERVAL`` seconds, however many clients are
+subscribed. Subscribers hold a single-slot queue, so a slow client only ever
+sees the newest state and intermediate updates are coalesced. The feed stops
+when its last subscriber leaves.
+
+Events carry the feed's random epoch and its version as their SSE ``id``, so
+ids never repeat across feeds, whether a feed was restarted or lives in
+another worker. A client reconnecting with a ``Last-Event-ID`` it already has
+gets nothing until the next change; otherwise it gets a full snapshot and
+deltas from there.
+"""
+import asyncio
+import json
+import os
+import uuid
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.db import models
+from app.db.database import SessionLocal
+from app.services import tally_service
+
+RESULTS_STREAM_INTERVAL = float(os.getenv("RESULTS_STREAM_INTERVAL", "2"))
+_KEEPALIVE_SECONDS = 15
+
+
+def _load_state(election_id: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        status = db.query(models.Election.status).filter(
+            models.Election.election_id == election_id).scalar()
+        if status is None:
+            return None
+        counts = tally_service.get_vote_counts(db, election_id)
+        return {"status": status.value, "turnout": sum(counts.values()), "candidates": counts}
+    finally:
+        db.close()
+
+
+class ElectionFeed:
+    def __init__(self, election_id: str, state: dict):
+        self.election_id = election_id
+        self.state = state
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 1
+        self.subscribers: set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def event_id(self) -> str:
+        return f"{self.epoch}-{self.version}"
+
+    def publish(self):
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((self.event_id, self.state))
+
+    async def run(self):
+        try:
+            while self.subscribers:
+                await asyncio.sleep(RESULTS_STREAM_INTERVAL)
+                state = await run_in_threadpool(_load_state, self.election_id)
+                if state is not None and state != self.state:
+                    self.version += 1
+                    self.state = state
+                    self.publish()
+        finally:
+            if _feeds.get(self.election_id) is self:
+                del _feeds[self.election_id]
+
+
+_feeds: dict[str, ElectionFeed] = {}
+
+
+async def _get_feed(election_id: str) -> ElectionFeed:
+    feed = _feeds.get(election_id)
+    if feed is None:
+        state = await run_in_threadpool(_load_state, election_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Election not found")
+        # Another subscriber may have created it while we were loading
+        feed = _feeds.get(election_id)
+        if feed is None:
+            feed = _feeds[election_id] = ElectionFeed(election_id, state)
+    return feed
+
+
+def _visible(state: dict, show_counts: bool) -> dict:
+    # Only completed elections expose per-candidate counts to voters
+    if show_counts or state["status"] == models.ElectionStatus.COMPLETED.value:
+        return state
+    return {"status": state["status"], "turnout": state["turnout"], "candidates": {}}
+
+
+def _event(event_id: str, payload: dict) -> str:
+    return f"id: {event_id}\nevent: results\ndata: {json.dumps(payload)}\n\n"
+
+
+async def subscribe(election_id: str, show_counts: bool, last_event_id: Optional[str] = None):
+    """Open a subscription; returns an async iterator of SSE frames"""
+    feed = await _get_feed(election_id)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+    feed.subscribers.add(queue)
+    if feed.task is None or feed.task.done():
+        feed.task = asyncio.create_task(feed.run())
+    if last_event_id != feed.event_id:
+        queue.put_nowait((feed.event_id, feed.state))
+    return _stream(feed, queue, show_counts, resumed=last_event_id is not None)
+
+
+async def _stream(feed: ElectionFeed, queue: asyncio.Queue, show_counts: bool, resumed: bool):
+    sent: Optional[dict] = None
+    try:
+        yield f"retry: {int(RESULTS_STREAM_INTERVAL * 1000)}\n\n"
+        if resumed and queue.empty():
+            # Client already has the current version; start deltas from it
+            sent = _visible(feed.state, show_counts)
+        while True:
+            try:
+                event_id, state = await asyncio.wait_for(queue.get(), timeout=_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            visible = _visible(state, show_counts)
+            # Deltas can't express a candidate leaving the election
+            if (sent is None or sent["status"] != visible["status"]
+                    or sent["candidates"].keys() != visible["candidates"].keys()):
+                payload = dict(visible, full=True)
+            else:
+                changed = {
+                    candidate_id: count for candidate_id, count in visible["candidates"].items()
+                    if sent["candidates"].get(candidate_id) != count
+                }
+                if changed == {} and sent["turnout"] == visible["turnout"]:
+                    continue
+                payload = {"status": visible["status"], "turnout": visible["turnout"],
+                           "candidates": changed, "full": False}
+            sent = visible
+            yield _event(event_id, payload)
+    finally:
+        feed.subscribers.discard(queue)
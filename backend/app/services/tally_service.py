@@ -0,0 +1,104 @@
+"""Running vote counts per (election, candidate).
+
+``cast_vote`` bumps a counter row in the same transaction as the vote insert,
+so results are read from O(candidates) rows instead of aggregating ``votes``.
+Each pair can be split over ``TALLY_SHARDS`` sub-counters; a vote picks one at
+random, so concurrent voters for a popular candidate don't all queue on the
+same row lock. Readers sum the shards.
+"""
+import os
+import random
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+TALLY_SHARDS = max(1, int(os.getenv("TALLY_SHARDS", "1")))
+
+
+def create_tallies(db: Session, election_id: str, candidate_id: str):
+    """Create the zeroed counter rows for a candidate newly added to an election"""
+    for shard in range(TALLY_SHARDS):
+        db.add(models.ElectionTally(
+            election_id=election_id, candidate_id=candidate_id, shard=shard, vote_count=0))
+
+
+def delete_tallies(db: Session, election_id: str, candidate_id: str):
+    """Drop the counter rows of a candidate removed from an election; the caller commits"""
+    db.query(models.ElectionTally).filter(
+        models.ElectionTally.election_id == election_id,
+        models.ElectionTally.candidate_id == candidate_id
+    ).delete(synchronize_session=False)
+
+
+def _bump(db: Session, election_id: str, candidate_id: str, shard: int, amount: int) -> int:
+    return db.query(models.ElectionTally).filter(
+        models.ElectionTally.election_id == election_id,
+        models.ElectionTally.candidate_id == candidate_id,
+        models.ElectionTally.shard == shard
+    ).update({models.ElectionTally.vote_count: models.ElectionTally.vote_count + amount},
+             synchronize_session=False)
+
+
+def increment_tally(db: Session, election_id: str, candidate_id: str, amount: int = 1):
+    """Count votes for a candidate; the caller commits together with the votes"""
+    shard = random.randrange(TALLY_SHARDS)
+    if _bump(db, election_id, candidate_id, shard, amount):
+        return
+    # Candidate registered before tallies existed, or TALLY_SHARDS was raised
+    try:
+        with db.begin_nested():
+            db.add(models.ElectionTally(
+                election_id=election_id, candidate_id=candidate_id, shard=shard, vote_count=amount))
+    except IntegrityError:
+        _bump(db, election_id, candidate_id, shard, amount)
+
+
+def get_vote_counts(db: Session, election_id: str) -> dict[str, int]:
+    """Get {candidate_id: vote_count} for every tallied candidate of an election"""
+    return {
+        candidate_id: int(count or 0) for candidate_id, count in db.query(
+            models.ElectionTally.candidate_id, func.sum(models.ElectionTally.vote_count)
+        ).filter(
+            models.ElectionTally.election_id == election_id
+        ).group_by(models.ElectionTally.candidate_id)
+    }
+
+
+def check_tallies(db: Session, election_id: str, repair: bool = False) -> dict:
+    """Compare the counters against ``votes`` and optionally rebuild them from it"""
+    counted = dict(db.query(
+        models.Vote.candidate_id, func.count(models.Vote.vote_id)
+    ).filter(
+        models.Vote.election_id == election_id
+    ).group_by(models.Vote.candidate_id).all())
+    tallied = dict(db.query(
+        models.ElectionTally.candidate_id, func.sum(models.ElectionTally.vote_count)
+    ).filter(
+        models.ElectionTally.election_id == election_id
+    ).group_by(models.ElectionTally.candidate_id).all())
+
+    mismatches = [
+        {"candidate_id": candidate_id, "votes": counted.get(candidate_id, 0),
+         "tally": int(tallied.get(candidate_id) or 0)}
+        for candidate_id in sorted(set(counted) | set(tallied))
+        if counted.get(candidate_id, 0) != int(tallied.get(candidate_id) or 0)
+    ]
+
+    if repair and mismatches:
+        db.query(models.ElectionTally).filter(
+            models.ElectionTally.election_id == election_id).delete(synchronize_session=False)
+        for candidate_id in set(counted) | set(tallied):
+            db.add(models.ElectionTally(
+                election_id=election_id, candidate_id=candidate_id, shard=0,
+                vote_count=counted.get(candidate_id, 0)))
+        db.commit()
+
+    return {
+        "election_id": election_id,
+        "total_votes": sum(counted.values()),
+        "mismatches": mismatches,
+        "repaired": bool(repair and mismatches),
+    }
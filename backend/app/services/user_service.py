@@ -1,31 +1,39 @@
-import face_recognition
-import numpy as np
+import os
+from datetime import datetime
+from typing import Optional
+
 from fastapi import HTTPException, UploadFile
-from passlib.context import CryptContext
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.core import passwords
 from app.db import models, schemas
 from app.db.models import User
-from app.utils.id_generator import generate_id
+from app.services import face_duplicates, face_pipeline, id_allocator
+from app.services.face_gallery import gallery, identify
+from app.utils.face_encoding import serialize_encoding
+from app.utils.pagination import Page, paginate
+from app.utils.ttl_cache import TTLCache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Principals of recently authenticated users; other workers see role changes
+# once their copy expires
+principal_cache = TTLCache(
+    "user_principal",
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "30")),
+)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return passwords.hash_password(password)
 
 
 def create_user(db: Session, user: schemas.UserCreate):
     try:
-        while True:
-            new_user_id = generate_id()
-            if not db.query(User).filter_by(user_id=new_user_id).first():
-                break
-
         hashed_password = get_password_hash(user.password)
         db_user = models.User(
-            user_id=new_user_id,
+            user_id=id_allocator.user_ids.next_id(db),
             email=user.email,
             full_name=user.full_name,
             hashed_password=hashed_password,
@@ -35,6 +43,9 @@ def create_user(db: Session, user: schemas.UserCreate):
         db.commit()
         db.refresh(db_user)
         return db_user
+    except HTTPException:
+        db.rollback()
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(
@@ -47,17 +58,22 @@ def create_user(db: Session, user: schemas.UserCreate):
 
 def verify_password(plain_password: str, hashed_password: str):
     """Verify a password"""
-    return pwd_context.verify(plain_password, hashed_password)
+    verified, _ = passwords.verify_and_update(plain_password, hashed_password)
+    return verified
 
 
 def login_user(db: Session, email: str, password: str):
-    """Login a user"""
+    """Login a user, upgrading their password hash if it uses an old cost"""
     user = get_user_by_email(db, email)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = passwords.verify_and_update(password, user.hashed_password)
+    if not verified:
         raise HTTPException(status_code=401, detail="Incorrect password")
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
 
     return user
 
@@ -72,9 +88,46 @@ def get_user_by_id(db: Session, user_id: str):
     return db.query(models.User).filter(models.User.user_id == user_id).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 10):
-    """Get all users with pagination"""
-    return db.query(models.User).offset(skip).limit(limit).all()
+def principal_query():
+    """Select the columns of a user's principal, leaving out the face blob"""
+    return select(
+        User.user_id, User.email, User.full_name, User.role,
+        User.face_encoding.isnot(None).label("has_face")
+    )
+
+
+def to_principal(row) -> schemas.CurrentUser:
+    return schemas.CurrentUser(
+        user_id=row.user_id,
+        email=row.email,
+        full_name=row.full_name,
+        role=row.role,
+        has_face=bool(row.has_face)
+    )
+
+
+def get_user_principal(db: Session, user_id: str):
+    """Get the cached principal of a user, loading it without the face blob on a miss"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    row = db.execute(principal_query().where(User.user_id == user_id)).first()
+    if not row:
+        return None
+    principal = to_principal(row)
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+def get_face_encoding(db: Session, user_id: str):
+    """Get only the stored face encoding blob of a user"""
+    return db.query(User.face_encoding).filter(User.user_id == user_id).scalar()
+
+
+def get_users(db: Session, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """Get the users in creation order, or one page of them"""
+    return paginate(db.query(models.User), models.User.id, cursor, limit)
 
 
 def update_user_role(db: Session, user_id: str, new_role: str):
@@ -86,6 +139,7 @@ def update_user_role(db: Session, user_id: str, new_role: str):
         user.role = new_role
         db.commit()
         db.refresh(user)
+        principal_cache.pop(user_id)
         return user
     except SQLAlchemyError as e:
         db.rollback()
@@ -93,37 +147,44 @@ def update_user_role(db: Session, user_id: str, new_role: str):
             status_code=500, detail=f"Database error: {str(e)}")
 
 
+def build_user_with_face(user_id: str, user: schemas.UserCreate, hashed_password: str, face_encoding,
+                         duplicate_of: Optional[str] = None):
+    """Build an unsaved user row with an already computed face encoding"""
+    return models.User(
+        user_id=user_id,
+        email=user.email,
+        full_name=user.full_name,
+        hashed_password=hashed_password,
+        role=user.role or "voter",
+        face_encoding=serialize_encoding(face_encoding),
+        face_enrolled_at=datetime.utcnow(),
+        duplicate_of=duplicate_of
+    )
+
+
 def create_user_with_face(db: Session, user: schemas.UserCreate, image_file: UploadFile):
     """Create a user with face data"""
     try:
-        while True:
-            new_user_id = generate_id()
-            if not db.query(User).filter_by(user_id=new_user_id).first():
-                break
-
         # Now process the image and save user
-        image = face_recognition.load_image_file(image_file.file)
-        encodings = face_recognition.face_encodings(image)
-        if not encodings:
+        face_encoding = face_pipeline.encode_upload(image_file, "enroll")
+        if face_encoding is None:
             raise HTTPException(
                 status_code=400, detail="No face found in the image")
-
-        face_encoding = np.array(encodings[0])
+        duplicate_of = face_duplicates.check_enrollment(db, face_encoding)
         hashed_password = get_password_hash(user.password)
-
-        db_user = models.User(
-            user_id=new_user_id,
-            email=user.email,
-            full_name=user.full_name,
-            hashed_password=hashed_password,
-            role=user.role or "voter",
-            face_encoding=face_encoding.tobytes()
-        )
+        # Lease last: a lease's row lock is held until this commit
+        new_user_id = id_allocator.user_ids.next_id(db)
+        db_user = build_user_with_face(new_user_id, user, hashed_password, face_encoding, duplicate_of)
 
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
+        gallery.add(db_user.user_id, face_encoding)
+        principal_cache.pop(db_user.user_id)
         return db_user
+    except HTTPException:
+        db.rollback()
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(
@@ -137,19 +198,23 @@ def create_user_with_face(db: Session, user: schemas.UserCreate, image_file: Upl
 def add_face_data_to_user(db: Session, user: models.User, image_file: UploadFile):
     """Add face data to an existing user"""
     try:
-        image = face_recognition.load_image_file(image_file.file)
-        encodings = face_recognition.face_encodings(image)
-        if not encodings:
+        face_encoding = face_pipeline.encode_upload(image_file, "enroll")
+        if face_encoding is None:
             raise HTTPException(
                 status_code=400, detail="No face found in the image")
-
-        face_encoding = np.array(encodings[0])
-        user.face_encoding = face_encoding.tobytes()
+        user.duplicate_of = face_duplicates.check_enrollment(db, face_encoding, user.user_id)
+        user.face_encoding = serialize_encoding(face_encoding)
+        user.face_enrolled_at = datetime.utcnow()
 
         db.add(user)
         db.commit()
         db.refresh(user)
+        gallery.add(user.user_id, face_encoding)
+        principal_cache.pop(user.user_id)
         return user
+    except HTTPException:
+        db.rollback()
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(
@@ -163,29 +228,18 @@ def add_face_data_to_user(db: Session, user: models.User, image_file: UploadFile
 def login_with_face(db: Session, image_file: UploadFile):
     """Login a user with face data"""
     try:
-        image = face_recognition.load_image_file(image_file.file)
-        encodings = face_recognition.face_encodings(image)
-        if not encodings:
+        input_encoding = face_pipeline.encode_upload(image_file, "login")
+        if input_encoding is None:
             raise HTTPException(
                 status_code=400, detail="No face found in the image")
 
-        input_encoding = encodings[0]
-
-        # Get all users with face data
-        users = db.query(models.User).filter(
-            models.User.face_encoding.isnot(None)).all()
-
-        # Compare with all registered faces
-        for user in users:
-            stored_encoding = np.frombuffer(
-                user.face_encoding, dtype=np.float64)
-            results = face_recognition.compare_faces(
-                [stored_encoding], input_encoding, tolerance=0.6)
-
-            if results[0]:
-                return user
+        user_id = identify(db, input_encoding, tolerance=0.6)
+        if user_id:
+            return get_user_by_id(db, user_id)
 
         raise HTTPException(status_code=404, detail="Face not recognized")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error during face login: {str(e)}")
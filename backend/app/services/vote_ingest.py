@@ -0,0 +1,160 @@
+"""Group-commit ingestion of ballots for peak voting windows.
+
+With ``VOTE_GROUP_COMMIT=true`` validated ballots are not committed by the
+request that cast them. They go onto an in-process queue that a single writer
+thread drains in micro-batches: up to ``VOTE_BATCH_MAX_SIZE`` ballots, waiting
+at most ``VOTE_BATCH_LINGER_MS`` for a batch to fill, are written with one
+multi-row insert and one commit. Each request blocks until the batch holding
+its ballot has committed, so a vote is only acknowledged once it is durable in
+the database; ballots still queued when the process dies were never
+acknowledged. Requests hand their connection back to the pool before waiting,
+since the writer needs one from the same pool. The writer re-checks that each election is still active under a
+share lock on its row, so ballots still queued when an election ends are
+refused instead of landing after its results snapshot.
+"""
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.db import models
+from app.db.database import SessionLocal
+from app.services import tally_service
+
+VOTE_GROUP_COMMIT = os.getenv("VOTE_GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+VOTE_BATCH_MAX_SIZE = int(os.getenv("VOTE_BATCH_MAX_SIZE", "256"))
+VOTE_BATCH_LINGER_MS = float(os.getenv("VOTE_BATCH_LINGER_MS", "5"))
+
+_ALREADY_VOTED = "You have already voted in this election"
+
+
+class VoteBatcher:
+    def __init__(self, max_size: int = VOTE_BATCH_MAX_SIZE, linger_ms: float = VOTE_BATCH_LINGER_MS):
+        self.max_size = max_size
+        self.linger = linger_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="vote-ingest")
+        self._thread.start()
+
+    def submit(self, vote: dict):
+        """Queue a validated ballot and wait until it is committed"""
+        future = Future()
+        self._queue.put((vote, future))
+        future.result()
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            self._flush(self._next_batch())
+
+    def _flush(self, batch: list):
+        # Two ballots from one voter can land in the same batch before either is stored
+        accepted = []
+        voters = set()
+        for vote, future in batch:
+            key = (vote["election_id"], vote["voter_id"])
+            if key in voters:
+                future.set_exception(HTTPException(status_code=400, detail=_ALREADY_VOTED))
+            else:
+                voters.add(key)
+                accepted.append((vote, future))
+        if not accepted:
+            return
+
+        db = SessionLocal()
+        try:
+            try:
+                accepted = self._open_ballots(db, accepted)
+                if not accepted:
+                    db.rollback()
+                    return
+                self._write(db, [vote for vote, _ in accepted])
+                db.commit()
+                for _, future in accepted:
+                    future.set_result(None)
+                return
+            except PoolTimeoutError:
+                # Retrying row by row would wait out the pool once per ballot
+                db.rollback()
+                for _, future in accepted:
+                    if not future.done():
+                        future.set_exception(HTTPException(
+                            status_code=503, detail="Server is busy, please retry shortly",
+                            headers={"Retry-After": "1"}))
+                return
+            except SQLAlchemyError:
+                db.rollback()
+
+            # Isolate the ballot(s) that broke the batch
+            for vote, future in accepted:
+                try:
+                    if not self._open_ballots(db, [(vote, future)]):
+                        db.rollback()
+                        continue
+                    self._write(db, [vote])
+                    db.commit()
+                    future.set_result(None)
+                except IntegrityError:
+                    db.rollback()
+                    future.set_exception(HTTPException(status_code=400, detail=_ALREADY_VOTED))
+                except SQLAlchemyError as e:
+                    db.rollback()
+                    future.set_exception(HTTPException(status_code=500, detail=f"Database error: {str(e)}"))
+        except Exception as e:
+            for _, future in accepted:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _open_ballots(db, entries: list) -> list:
+        """Share-lock the elections of a batch and refuse ballots for ones that have ended.
+
+        The request checked the election before queueing the ballot; the lock,
+        held until the batch commits, keeps ``end_election`` from snapshotting
+        the votes in between.
+        """
+        election_ids = {vote["election_id"] for vote, _ in entries}
+        active = {
+            election_id for (election_id,) in db.query(models.Election.election_id).filter(
+                models.Election.election_id.in_(election_ids),
+                models.Election.status == models.ElectionStatus.ACTIVE
+            ).with_for_update(read=True)
+        }
+        open_entries = []
+        for vote, future in entries:
+            if vote["election_id"] in active:
+                open_entries.append((vote, future))
+            else:
+                future.set_exception(HTTPException(status_code=400, detail="Election is not active"))
+        return open_entries
+
+    @staticmethod
+    def _write(db, votes: list):
+        db.execute(insert(models.Vote), votes)
+        counts = Counter((vote["election_id"], vote["candidate_id"]) for vote in votes)
+        for (election_id, candidate_id), amount in counts.items():
+            tally_service.increment_tally(db, election_id, candidate_id, amount)
+
+
+batcher = VoteBatcher() if VOTE_GROUP_COMMIT else None
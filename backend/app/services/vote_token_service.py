@@ -0,0 +1,69 @@
+"""Single-use vote tokens issued after a successful face verification.
+
+Tokens are JWTs from ``core.token``, always bound to one election, and are
+checked without touching the database. A token is only used up once the
+ballot it came with is stored: ``redeem`` holds its ``jti`` while the ballot
+is written and lets go again if that fails. A used ``jti`` is remembered until
+the token would expire anyway, so it cannot be replayed within this process;
+the one-ballot-per-voter constraint still stops a second vote if a token is
+replayed against another worker. Every ballot needs a token unless
+``REQUIRE_VOTE_TOKEN`` is set to false.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.core.token import VOTE_TOKEN_EXPIRE_MINUTES, create_vote_token, verify_vote_token
+from app.utils.ttl_cache import TTLCache
+
+REQUIRE_VOTE_TOKEN = os.getenv("REQUIRE_VOTE_TOKEN", "true").lower() not in ("0", "false", "no")
+
+_used_tokens = TTLCache(
+    "vote_token_used",
+    maxsize=int(os.getenv("VOTE_TOKEN_REPLAY_CACHE_SIZE", "100000")),
+    ttl=VOTE_TOKEN_EXPIRE_MINUTES * 60,
+)
+_used_lock = threading.Lock()
+
+
+def issue(user_id: str, election_id: str):
+    """Create a vote token for a verified user, bound to one election"""
+    return create_vote_token(user_id, election_id)
+
+
+def _check(token: Optional[str], user_id: str, election_id: str) -> Optional[str]:
+    """Return the jti of a valid token for this voter and election, or None when there is none"""
+    if token is None:
+        if REQUIRE_VOTE_TOKEN:
+            raise HTTPException(status_code=403, detail="Face verification is required before voting")
+        return None
+
+    payload = verify_vote_token(token)
+    if not payload or payload.get("sub") != user_id:
+        raise HTTPException(status_code=403, detail="Invalid or expired vote token")
+    if payload.get("election_id") != election_id:
+        raise HTTPException(status_code=403, detail="Vote token was issued for another election")
+    return payload["jti"]
+
+
+@contextmanager
+def redeem(token: Optional[str], user_id: str, election_id: str):
+    """Check the vote token sent with a ballot and use it up once the block stores the ballot"""
+    jti = _check(token, user_id, election_id)
+    if jti is None:
+        yield
+        return
+
+    with _used_lock:
+        if _used_tokens.get(jti) is not None:
+            raise HTTPException(status_code=403, detail="Vote token has already been used")
+        _used_tokens.set(jti, True)
+    try:
+        yield
+    except BaseException:
+        # The ballot was refused or not stored, so the voter may retry with the same token
+        _used_tokens.pop(jti)
+        raise
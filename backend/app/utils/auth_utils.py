@@ -1,37 +1,72 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import ExpiredSignatureError, JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.token import ALGORITHM, SECRET_KEY
-from app.db.database import get_db
-from app.services.user_service import get_user_by_id
+from app.core.token import ALGORITHM, SECRET_KEY, VOTE_TOKEN_TYPE
+from app.db.database import SessionLocal, get_async_db, get_db
+from app.services import async_user_service
+from app.services.user_service import get_user_principal
 
 security = HTTPBearer()
 
 
-def get_current_user(
-    token: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
-    """Get the current user from the token"""
+def _token_user_id(token: HTTPAuthorizationCredentials) -> str:
+    """The user ID a login token was issued for"""
     try:
         payload = jwt.decode(token.credentials, SECRET_KEY,
                              algorithms=[ALGORITHM])
         user_id = payload.get("sub")
-        if user_id is None:
+        # Vote tokens are signed with the same key but must never act as logins
+        if user_id is None or payload.get("typ") == VOTE_TOKEN_TYPE:
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
+    return user_id
+
 
-    user = get_user_by_id(db, user_id)
+def get_current_user(
+    token: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+):
+    """Get the current user from the token
+
+    Returns a cached ``CurrentUser`` principal; handlers that need the face
+    encoding load it explicitly.
+    """
+    user = get_user_principal(db, _token_user_id(token))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
+async def get_current_user_async(
+    token: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """get_current_user on the async engine, for async handlers that use get_async_db
+
+    FastAPI hands the handler the same session, so the request holds one
+    connection from one pool.
+    """
+    user = await async_user_service.get_user_principal(db, _token_user_id(token))
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+def get_streaming_user(token: HTTPAuthorizationCredentials = Depends(security)):
+    """Like get_current_user, but gives the DB connection back before a long-lived response starts"""
+    db = SessionLocal()
+    try:
+        return get_current_user(token=token, db=db)
+    finally:
+        db.close()
+
+
 def require_role(user, allowed_roles: list[str]):
     """Require a user to have a specific role"""
     if user.role not in allowed_roles:
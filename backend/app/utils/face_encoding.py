@@ -0,0 +1,57 @@
+"""Serialization of face encodings stored in ``User.face_encoding``.
+
+Blobs start with a one byte format tag:
+
+* ``0x01`` - 128 little-endian float32 values (513 bytes)
+* ``0x02`` - float32 scale followed by 128 int8 values (133 bytes)
+
+Rows written before the tag existed are a bare ``float64.tobytes()`` (1024
+bytes). None of the tagged formats can have that length, so they are told
+apart by size and still load transparently.
+"""
+import os
+
+import numpy as np
+
+ENCODING_DIM = 128
+
+FORMAT_FLOAT32 = 0x01
+FORMAT_INT8 = 0x02
+
+_FORMATS = {"float32": FORMAT_FLOAT32, "int8": FORMAT_INT8}
+_LEGACY_SIZE = ENCODING_DIM * 8
+_FLOAT32_SIZE = 1 + ENCODING_DIM * 4
+_INT8_SIZE = 1 + 4 + ENCODING_DIM
+
+FACE_ENCODING_FORMAT = _FORMATS[os.getenv("FACE_ENCODING_FORMAT", "float32")]
+
+
+def serialize_encoding(encoding, fmt: int = FACE_ENCODING_FORMAT) -> bytes:
+    """Serialize an encoding to the tagged storage format"""
+    values = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+    if fmt == FORMAT_FLOAT32:
+        return bytes([FORMAT_FLOAT32]) + values.astype("<f4").tobytes()
+    if fmt == FORMAT_INT8:
+        # Symmetric per-vector scale; dlib encodings sit well inside [-1, 1]
+        scale = float(np.abs(values).max()) / 127.0 or 1.0
+        quantized = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+        return bytes([FORMAT_INT8]) + np.float32(scale).astype("<f4").tobytes() + quantized.tobytes()
+    raise ValueError(f"Unknown face encoding format: {fmt}")
+
+
+def deserialize_encoding(blob: bytes) -> np.ndarray:
+    """Read a stored encoding, in any known format, as a float32 vector"""
+    size = len(blob)
+    if size == _LEGACY_SIZE:
+        return np.frombuffer(blob, dtype=np.float64).astype(np.float32)
+    if size == _FLOAT32_SIZE and blob[0] == FORMAT_FLOAT32:
+        return np.frombuffer(blob, dtype="<f4", offset=1).astype(np.float32)
+    if size == _INT8_SIZE and blob[0] == FORMAT_INT8:
+        scale = np.frombuffer(blob, dtype="<f4", count=1, offset=1)[0]
+        return np.frombuffer(blob, dtype=np.int8, offset=5).astype(np.float32) * scale
+    raise ValueError(f"Unrecognized face encoding blob of {size} bytes")
+
+
+def is_current_format(blob: bytes, fmt: int = FACE_ENCODING_FORMAT) -> bool:
+    """Whether a stored blob is already in the configured format"""
+    return len(blob) != _LEGACY_SIZE and blob[0] == fmt
@@ -1,8 +1,37 @@
-import random
+import os
 import string
+import time
 
+ID_ALPHABET = string.ascii_uppercase + string.digits
+ID_LENGTH = 6
+ID_SPACE = len(ID_ALPHABET) ** ID_LENGTH
 
-def generate_id(length=6):
-    """Generate a unique ID"""
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(random.choices(characters, k=length))
+# Affine map v -> (A*v + B) mod 36^6. A shares no factor with 36, so the map is
+# a bijection: distinct sequence values give distinct IDs that don't look
+# sequential. Never change these once IDs have been issued.
+_PERMUTE_A = 1580030173
+_PERMUTE_B = 742938285
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def sequence_to_id(value: int) -> str:
+    """Map a sequence value below 36^6 to its 6-character ID"""
+    if not 0 <= value < ID_SPACE:
+        raise ValueError(f"Sequence value {value} is outside the ID space")
+    value = (_PERMUTE_A * value + _PERMUTE_B) % ID_SPACE
+    chars = []
+    for _ in range(ID_LENGTH):
+        value, digit = divmod(value, len(ID_ALPHABET))
+        chars.append(ID_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def generate_time_id() -> str:
+    """Generate a 26-character ULID-style ID: 48-bit milliseconds then 80 random bits"""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    chars = []
+    for _ in range(26):
+        value, digit = divmod(value, 32)
+        chars.append(_CROCKFORD[digit])
+    return ''.join(reversed(chars))
@@ -0,0 +1,91 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+A page is read with ``WHERE key > :last_key ORDER BY key LIMIT :limit + 1`` on
+an indexed, unique column, so every page costs the same however deep the
+client has paged. The extra row only tells whether another page exists. The
+cursor handed to clients is an opaque token wrapping the last key of the page;
+endpoints return it in the ``X-Next-Cursor`` header so the list bodies keep
+their shape. Paging is opt-in: a request with neither ``limit`` nor
+``cursor`` gets the whole list, as clients written before paging expect.
+"""
+import base64
+import json
+import os
+from typing import Any, NamedTuple, Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "500"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(NamedTuple):
+    items: list
+    next_cursor: Optional[str]
+
+
+def encode_cursor(key: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps([key]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: Optional[type] = None) -> Any:
+    """Return the key wrapped in a cursor, or raise 400 for a malformed one"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        (key,) = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # A tampered cursor must not reach the comparison with the key column; bool is an int too
+    if key_type is not None and (not isinstance(key, key_type) or isinstance(key, bool)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to [1, PAGE_SIZE_MAX]"""
+    if not limit:
+        return PAGE_SIZE_DEFAULT
+    return max(1, min(limit, PAGE_SIZE_MAX))
+
+
+def _page_query(query, key_column, cursor: Optional[str], limit: Optional[int]):
+    """Order and bound a Query or select() for one page; size is None for the whole list"""
+    if cursor is None and limit is None:
+        return query.order_by(key_column), None
+    size = page_size(limit)
+    if cursor:
+        query = query.filter(key_column > decode_cursor(cursor, key_column.type.python_type))
+    return query.order_by(key_column).limit(size + 1), size
+
+
+def _to_page(rows: list, key_column, size: Optional[int]) -> Page:
+    if size is None or len(rows) <= size:
+        return Page(rows, None)
+    rows = rows[:size]
+    return Page(rows, encode_cursor(getattr(rows[-1], key_column.key)))
+
+
+def paginate(query, key_column, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """Read one page of query ordered by key_column, starting after cursor"""
+    query, size = _page_query(query, key_column, cursor, limit)
+    return _to_page(query.all(), key_column, size)
+
+
+async def paginate_async(db: AsyncSession, statement, key_column, cursor: Optional[str] = None,
+                         limit: Optional[int] = None) -> Page:
+    """Read one page of a select() of ORM entities on an AsyncSession"""
+    statement, size = _page_query(statement, key_column, cursor, limit)
+    return _to_page((await db.execute(statement)).scalars().all(), key_column, size)
+
+
+def validate_page(schema, page: Page) -> Page:
+    """Convert the rows of a page to schema instances, e.g. before caching it"""
+    return Page([schema.model_validate(item) for item in page.items], page.next_cursor)
+
+
+def set_next_cursor(response: Response, page: Page):
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.core.metrics import Counter, Gauge
+
+cache_requests = Counter("cache_requests_total", "Cache lookups by result", ["cache", "result"])
+cache_entries = Gauge("cache_entries", "Entries held by each cache", ["cache"])
+cache_bytes = Gauge("cache_bytes", "Approximate bytes held by size-limited caches", ["cache"])
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds.
+
+    When ``max_bytes`` is set, ``sizeof`` gives the weight of each value and
+    least recently used entries are evicted to stay under it.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._lock = threading.Lock()
+        self._data: OrderedDict = OrderedDict()
+        self._bytes = 0
+
+    def _evict(self, key: Hashable):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(key)
+                cache_requests.inc(cache=self.name, result="hit")
+                return entry[0]
+            if entry is not None:
+                self._evict(key)
+        cache_requests.inc(cache=self.name, result="miss")
+        return default
+
+    def set(self, key: Hashable, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._evict(key)
+            self._data[key] = (value, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._evict(next(iter(self._data)))
+            cache_entries.set(len(self._data), cache=self.name)
+            cache_bytes.set(self._bytes, cache=self.name)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._evict(key)
+                cache_entries.set(len(self._data), cache=self.name)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            cache_entries.set(0, cache=self.name)
+
+    def __len__(self):
+        return len(self._data)
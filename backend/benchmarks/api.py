@@ -0,0 +1,288 @@
+"""Load and latency benchmark of the HTTP API.
+
+Starts the app under uvicorn against a scratch database, seeds synthetic
+voters, candidates and elections, then drives each workload with concurrent
+HTTP clients and prints one JSON report with throughput, p50/p95/p99 latency
+and SQL statements per request::
+
+    python -m benchmarks.api --voters 2000 --concurrency 32
+    python -m benchmarks.api --face-image me.jpg --gallery-sizes 1000,10000,100000
+    python -m benchmarks.api --database-url postgresql://user:pw@localhost/bench --output run.json
+
+Workloads run in this order: ``listings``, ``login_password``, ``login_face``
+(once per gallery size, only with ``--face-image``), ``cast_vote`` (one ballot
+per voter) and ``results`` (after the election is ended). Point
+``--database-url`` at an empty database; the seed data uses fixed IDs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+PASSWORD = "bench-password"
+FACE_USER_ID = "F00000"
+
+
+def _bench_id(prefix: str, index: int) -> str:
+    """6-character ID: a prefix letter and index in base 36"""
+    digits = ""
+    for _ in range(5):
+        index, digit = divmod(index, 36)
+        digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"[digit] + digits
+    return prefix + digits
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _summarize(name: str, samples: list[tuple[float, int, int]], elapsed: float, **extra) -> dict:
+    """samples are (seconds, status code, SQL statements) per request"""
+    latencies = sorted(seconds for seconds, _, _ in samples)
+    ok = [sample for sample in samples if sample[1] < 400]
+    return {
+        "workload": name,
+        **extra,
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "queries_per_request": round(sum(queries for _, _, queries in samples) / len(samples), 2) if samples else 0.0,
+    }
+
+
+async def _drive(client, requests: list, concurrency: int) -> tuple[list, float]:
+    """Send (method, url, kwargs) requests from concurrency workers"""
+    pending = iter(requests)
+    samples = []
+
+    async def worker():
+        for method, url, kwargs in pending:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            samples.append((time.perf_counter() - start, response.status_code,
+                            int(response.headers.get("x-db-queries", 0))))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def _seed(voters: int, candidates: int, elections: int) -> dict:
+    from app.core.passwords import pwd_context
+    from app.db import models
+    from app.db.database import SessionLocal
+    from app.services import tally_service
+
+    db = SessionLocal()
+    try:
+        # One shared hash: seeding shouldn't spend minutes in bcrypt
+        hashed_password = pwd_context.hash(PASSWORD)
+        voter_ids = [_bench_id("V", i) for i in range(voters)]
+        db.bulk_insert_mappings(models.User, [
+            {"user_id": user_id, "email": f"{user_id.lower()}@bench.example.com", "full_name": user_id,
+             "hashed_password": hashed_password, "role": "voter"}
+            for user_id in voter_ids
+        ])
+        db.add(models.User(user_id="A00000", email="admin@bench.example.com", full_name="Admin",
+                           hashed_password=hashed_password, role="admin"))
+
+        candidate_ids = [_bench_id("C", i) for i in range(candidates)]
+        db.bulk_insert_mappings(models.Candidate, [
+            {"candidate_id": candidate_id, "name": candidate_id, "party": "Bench", "manifesto": "-"}
+            for candidate_id in candidate_ids
+        ])
+
+        election_ids = [_bench_id("E", i) for i in range(elections)]
+        now = datetime.utcnow()
+        for index, election_id in enumerate(election_ids):
+            db.add(models.Election(
+                election_id=election_id, title=f"Benchmark {index}", description="-",
+                start_date=now, end_date=now + timedelta(days=1),
+                status=models.ElectionStatus.ACTIVE if index == 0 else models.ElectionStatus.UPCOMING))
+            for candidate_id in candidate_ids:
+                db.add(models.ElectionCandidate(election_id=election_id, candidate_id=candidate_id))
+                tally_service.create_tallies(db, election_id, candidate_id)
+        db.commit()
+    finally:
+        db.close()
+    return {"voter_ids": voter_ids, "candidate_ids": candidate_ids, "election_ids": election_ids}
+
+
+def _grow_gallery(start: int, size: int, seed: int = 0):
+    """Enroll synthetic face encodings until the gallery holds size users"""
+    import numpy as np
+
+    from app.db import models
+    from app.db.database import SessionLocal
+    from app.utils.face_encoding import serialize_encoding
+
+    rng = np.random.default_rng(seed + start)
+    db = SessionLocal()
+    try:
+        for offset in range(start, size, 5000):
+            count = min(5000, size - offset)
+            # Roughly unit-norm vectors sit ~1.4 apart, well outside the match tolerance
+            encodings = rng.normal(0.0, 0.09, size=(count, 128))
+            db.bulk_insert_mappings(models.User, [
+                {"user_id": _bench_id("G", offset + i), "email": f"g{offset + i}@bench.example.com",
+                 "full_name": "Gallery", "hashed_password": "-", "role": "voter",
+                 "face_encoding": serialize_encoding(encoding), "face_enrolled_at": datetime.utcnow()}
+                for i, encoding in enumerate(encodings)
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+
+def _enroll_face(image: bytes):
+    from app.db import models
+    from app.db.database import SessionLocal
+    from app.services import face_pipeline
+    from app.utils.face_encoding import serialize_encoding
+
+    encoding, _ = face_pipeline.process_image_bytes(image, face_pipeline.PROFILES["enroll"])
+    if encoding is None:
+        raise SystemExit("No face found in --face-image")
+    db = SessionLocal()
+    try:
+        db.add(models.User(user_id=FACE_USER_ID, email="face@bench.example.com", full_name="Face",
+                           hashed_password="-", role="voter", face_encoding=serialize_encoding(encoding),
+                           face_enrolled_at=datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _start_server():
+    import uvicorn
+
+    from app.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True, name="bench-server").start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}/api/v1"
+
+
+async def _benchmark(args, base_url: str, seeded: dict) -> list[dict]:
+    import httpx
+
+    from app.core.token import create_access_token
+    from app.services import vote_token_service
+
+    voter_ids = seeded["voter_ids"]
+    election_id = seeded["election_ids"][0]
+    tokens = {user_id: create_access_token({"sub": user_id}) for user_id in voter_ids + ["A00000"]}
+
+    def auth(user_id: str) -> dict:
+        return {"headers": {"Authorization": f"Bearer {tokens[user_id]}"}}
+
+    report = []
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        listing_urls = ["/elections/", f"/elections/{election_id}", f"/elections/{election_id}/candidates",
+                        "/candidates/", "/users/"]
+        requests = [("GET", listing_urls[i % len(listing_urls)], auth(voter_ids[i % len(voter_ids)]))
+                    for i in range(args.requests)]
+        report.append(_summarize("listings", *await _drive(client, requests, args.concurrency)))
+
+        requests = [("POST", "/auth/login", {"json": {"email": f"{voter_ids[i % len(voter_ids)].lower()}@bench.example.com",
+                                                      "password": PASSWORD}})
+                    for i in range(args.requests)]
+        report.append(_summarize("login_password", *await _drive(client, requests, args.concurrency)))
+
+        if args.face_image:
+            with open(args.face_image, "rb") as f:
+                image = f.read()
+            await asyncio.to_thread(_enroll_face, image)
+            enrolled = 1
+            for size in sorted(args.gallery_sizes):
+                await asyncio.to_thread(_grow_gallery, enrolled, size)
+                enrolled = max(enrolled, size)
+                requests = [("POST", "/auth/login/face", {"files": {"image": ("face.jpg", image, "image/jpeg")}})
+                            for _ in range(args.face_requests)]
+                report.append(_summarize("login_face", *await _drive(client, requests, args.concurrency),
+                                         gallery_size=enrolled))
+
+        candidate_ids = seeded["candidate_ids"]
+        requests = [("POST", f"/elections/{election_id}/vote",
+                     {"json": {"candidate_id": candidate_ids[i % len(candidate_ids)],
+                               "vote_token": vote_token_service.issue(voter_id, election_id)[0]},
+                      **auth(voter_id)})
+                    for i, voter_id in enumerate(voter_ids)]
+        report.append(_summarize("cast_vote", *await _drive(client, requests, args.concurrency)))
+
+        await client.post(f"/elections/{election_id}/end", **auth("A00000"))
+        requests = [("GET", f"/elections/{election_id}/results", auth(voter_ids[i % len(voter_ids)]))
+                    for i in range(args.requests)]
+        report.append(_summarize("results", *await _drive(client, requests, args.concurrency)))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--voters", type=int, default=2000)
+    parser.add_argument("--candidates", type=int, default=5)
+    parser.add_argument("--elections", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per listing/login/results workload")
+    parser.add_argument("--face-image", default=None, help="photo of one face, enables the login_face workload")
+    parser.add_argument("--gallery-sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[1000, 10000])
+    parser.add_argument("--face-requests", type=int, default=200)
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # All of these are read at import time
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["SQL_COUNT_HEADER"] = "true"
+    # login_face resends one photo, which the result cache would answer without running the pipeline
+    os.environ["FACE_CACHE_PROFILES"] = ""
+    from app.core.config import settings
+    from app.db.database import Base, engine
+    from app.db import models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    seeded = _seed(args.voters, args.candidates, args.elections)
+    server, base_url = _start_server()
+    try:
+        workloads = asyncio.run(_benchmark(args, base_url, seeded))
+    finally:
+        server.should_exit = True
+
+    report = {
+        "database": engine.url.get_backend_name(),
+        "pool_size": settings.DB_POOL_SIZE,
+        "voters": args.voters,
+        "candidates": args.candidates,
+        "elections": args.elections,
+        "concurrency": args.concurrency,
+        "workloads": workloads,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Users/sec of bulk enrollment versus one registration at a time.
+
+Builds an archive of ``--rows`` voters that all use the photos given with
+``--face-image``, enrolls it once row by row through
+``user_service.create_user_with_face`` (what an admin script calling
+``/auth/register/face`` per voter amounts to) and once through the bulk
+enrollment job, against a scratch database, and prints both as JSON::
+
+    python -m benchmarks.bulk_enrollment --face-image a.jpg --face-image b.jpg --rows 1000
+    python -m benchmarks.bulk_enrollment --face-image me.jpg --database-url postgresql://user:pw@localhost/bench
+
+Every row reuses a handful of faces, so the duplicate-face check is turned off
+for the run.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+PASSWORD = "bench-password"
+
+
+def _build_archive(path: str, prefix: str, rows: int, images: list[bytes]):
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(["email", "full_name", "password", "photo"])
+    for i in range(rows):
+        writer.writerow([f"{prefix}{i}@bench.example.com", f"Voter {i}", PASSWORD, f"photos/{i % len(images)}.jpg"])
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("manifest.csv", manifest.getvalue())
+        for i, image in enumerate(images):
+            archive.writestr(f"photos/{i}.jpg", image)
+
+
+def _sequential(rows: int, images: list[bytes]) -> dict:
+    from fastapi import UploadFile
+
+    from app.db import schemas
+    from app.db.database import SessionLocal
+    from app.services import user_service
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        for i in range(rows):
+            user = schemas.UserCreate(email=f"seq{i}@bench.example.com", full_name=f"Voter {i}",
+                                      password=PASSWORD, role="voter")
+            image = UploadFile(io.BytesIO(images[i % len(images)]), filename="face.jpg")
+            user_service.create_user_with_face(db, user, image)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    return {"mode": "sequential", "rows": rows, "created": rows, "seconds": round(elapsed, 2),
+            "users_per_sec": round(rows / elapsed, 2)}
+
+
+def _bulk(rows: int, images: list[bytes]) -> dict:
+    from app.services import enrollment_service
+
+    path = os.path.join(tempfile.mkdtemp(), "bulk.zip")
+    _build_archive(path, "bulk", rows, images)
+    job = enrollment_service.BulkEnrollmentJob(job_id="benchmark")
+    start = time.perf_counter()
+    # Run the job on this thread; it removes the archive when done
+    enrollment_service._run(job, path)
+    elapsed = time.perf_counter() - start
+    return {"mode": "bulk", "rows": rows, "created": job.created, "failed": job.failed,
+            "batch_size": enrollment_service.ENROLLMENT_BATCH_SIZE, "seconds": round(elapsed, 2),
+            "users_per_sec": round(job.created / elapsed, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--face-image", action="append", required=True, help="photo of one face; repeatable")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # All of these are read at import time
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["FACE_DUPLICATE_MODE"] = "off"
+    from app.db.database import Base, engine
+    from app.db import models  # noqa: F401
+    from app.services import face_pipeline
+
+    Base.metadata.create_all(bind=engine)
+    images = []
+    for path in args.face_image:
+        with open(path, "rb") as f:
+            images.append(f.read())
+
+    face_pipeline.start()
+    try:
+        sequential = _sequential(args.rows, images)
+        bulk = _bulk(args.rows, images)
+    finally:
+        face_pipeline.shutdown()
+
+    report = {
+        "database": engine.url.get_backend_name(),
+        "face_workers": face_pipeline.FACE_WORKERS,
+        "runs": [sequential, bulk],
+        "speedup": round(bulk["users_per_sec"] / sequential["users_per_sec"], 2),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
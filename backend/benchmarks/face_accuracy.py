@@ -0,0 +1,142 @@
+"""Encodings of the downscale-then-crop face pipeline versus full resolution.
+
+For every photo, encodes the largest face twice: the way the app did before
+the pipeline existed (HOG detection and the encoding on the full-size image)
+and through ``face_pipeline.process_image_bytes``. Photos are read from one
+sub-directory per person, so besides the distance between the two encodings
+of each photo the report shows how often same-person and different-person
+pairs match at ``--tolerance`` under either method::
+
+    python -m benchmarks.face_accuracy --photos ./photos --profile login
+    python -m benchmarks.face_accuracy --photos ./photos --tolerance 0.6 --output accuracy.json
+
+The layout is ``photos/<person>/<image>.jpg``. Use photos as the cameras
+produce them, since the savings and any drift both grow with the resolution.
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def _photos(root: str) -> list[tuple[str, str]]:
+    """(person, path) for every image under root"""
+    photos = []
+    for person in sorted(os.listdir(root)):
+        folder = os.path.join(root, person)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                photos.append((person, os.path.join(folder, name)))
+    return photos
+
+
+def _full_resolution(file, options):
+    """Largest face encoded on the full-size image; file is a path or a binary file object"""
+    import face_recognition
+
+    image = face_recognition.load_image_file(file)
+    boxes = face_recognition.face_locations(image)
+    if not boxes:
+        return None
+    box = max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+    return face_recognition.face_encodings(
+        image, known_face_locations=[box], num_jitters=options.num_jitters, model=options.model)[0]
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = np.asarray(values)
+    return {"mean": round(float(values.mean()), 4), "p50": round(float(np.percentile(values, 50)), 4),
+            "p95": round(float(np.percentile(values, 95)), 4), "max": round(float(values.max()), 4)}
+
+
+def _pair_rates(encodings: dict, people: dict, tolerance: float) -> dict:
+    """Match rate of same-person and different-person pairs"""
+    same, different = [], []
+    for a, b in itertools.combinations(sorted(encodings), 2):
+        matched = float(np.linalg.norm(encodings[a] - encodings[b])) <= tolerance
+        (same if people[a] == people[b] else different).append(matched)
+    return {
+        "same_person_pairs": len(same),
+        "same_person_match_rate": round(sum(same) / len(same), 4) if same else None,
+        "different_person_pairs": len(different),
+        "different_person_match_rate": round(sum(different) / len(different), 4) if different else None,
+    }
+
+
+def compare(root: str, profile: str, tolerance: float) -> dict:
+    from app.services import face_pipeline
+
+    options = face_pipeline.PROFILES[profile]
+    photos = _photos(root)
+    people = {}
+    full, pipeline = {}, {}
+    full_seconds, pipeline_seconds = [], []
+    missed = {"full_resolution": 0, "pipeline": 0}
+    for person, path in photos:
+        people[path] = person
+        start = time.perf_counter()
+        encoding = _full_resolution(path, options)
+        full_seconds.append(time.perf_counter() - start)
+        if encoding is None:
+            missed["full_resolution"] += 1
+        else:
+            full[path] = encoding
+
+        with open(path, "rb") as f:
+            data = f.read()
+        start = time.perf_counter()
+        encoding, _ = face_pipeline.process_image_bytes(data, options)
+        pipeline_seconds.append(time.perf_counter() - start)
+        if encoding is None:
+            missed["pipeline"] += 1
+        else:
+            pipeline[path] = encoding
+
+    both = sorted(set(full) & set(pipeline))
+    drift = [float(np.linalg.norm(full[path] - pipeline[path])) for path in both]
+    return {
+        "photos": len(photos),
+        "people": len(set(people.values())),
+        "profile": profile,
+        "model": options.model,
+        "num_jitters": options.num_jitters,
+        "detect_max_dim": face_pipeline.FACE_DETECT_MAX_DIM,
+        "work_max_dim": face_pipeline.FACE_WORK_MAX_DIM,
+        "tolerance": tolerance,
+        "no_face_found": missed,
+        "full_vs_pipeline_distance": _percentiles(drift),
+        "photos_drifting_over_tenth_of_tolerance": sum(d > tolerance / 10 for d in drift),
+        "full_resolution": {**_pair_rates({p: full[p] for p in both}, people, tolerance),
+                            "seconds_per_photo": _percentiles(full_seconds)},
+        "pipeline": {**_pair_rates({p: pipeline[p] for p in both}, people, tolerance),
+                     "seconds_per_photo": _percentiles(pipeline_seconds)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--photos", required=True, help="directory with one sub-directory of photos per person")
+    parser.add_argument("--profile", choices=["enroll", "login", "verify"], default="login")
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    output = json.dumps(compare(args.photos, args.profile, args.tolerance), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
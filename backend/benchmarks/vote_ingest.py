@@ -0,0 +1,105 @@
+"""Ballots/sec of per-request commits versus group-commit ingestion.
+
+Runs ``election_service.cast_vote`` from many threads against a scratch
+database, first committing every ballot on its own and then through
+``vote_ingest.VoteBatcher``, and prints the results as JSON::
+
+    python -m benchmarks.vote_ingest --voters 5000 --concurrency 32
+    python -m benchmarks.vote_ingest --database-url postgresql://user:pw@localhost/bench
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+
+def _seed(db, models, prefix: str, voters: int, candidates: int) -> tuple[str, list[str], list[str]]:
+    from app.services import tally_service
+
+    election_id = f"{prefix}E"
+    db.add(models.Election(
+        election_id=election_id, title=f"Benchmark {prefix}", start_date=datetime.utcnow(),
+        end_date=datetime.utcnow() + timedelta(days=1), status=models.ElectionStatus.ACTIVE))
+    candidate_ids = [f"{prefix}C{i:03d}"[-6:] for i in range(candidates)]
+    for candidate_id in candidate_ids:
+        db.add(models.Candidate(candidate_id=candidate_id, name=candidate_id, party="Bench", manifesto="-"))
+        db.add(models.ElectionCandidate(election_id=election_id, candidate_id=candidate_id))
+        tally_service.create_tallies(db, election_id, candidate_id)
+    voter_ids = [f"{prefix}{i:05d}"[-6:] for i in range(voters)]
+    db.bulk_insert_mappings(models.User, [
+        {"user_id": voter_id, "email": f"{voter_id.lower()}@bench.local", "full_name": voter_id,
+         "hashed_password": "-", "role": "voter"}
+        for voter_id in voter_ids
+    ])
+    db.commit()
+    return election_id, candidate_ids, voter_ids
+
+
+def _run(mode: str, voters: int, candidates: int, concurrency: int) -> dict:
+    from app.db import models, schemas
+    from app.db.database import SessionLocal
+    from app.services import election_service, vote_ingest, vote_token_service
+
+    prefix = "A" if mode == "per_request" else "B"
+    db = SessionLocal()
+    try:
+        election_id, candidate_ids, voter_ids = _seed(db, models, prefix, voters, candidates)
+    finally:
+        db.close()
+
+    vote_ingest.batcher = vote_ingest.VoteBatcher() if mode == "group_commit" else None
+    vote_tokens = [vote_token_service.issue(voter_id, election_id)[0] for voter_id in voter_ids]
+
+    def cast(index: int) -> bool:
+        session = SessionLocal()
+        try:
+            election_service.cast_vote(
+                session, election_id,
+                schemas.VoteCreate(candidate_id=candidate_ids[index % len(candidate_ids)],
+                                   vote_token=vote_tokens[index]),
+                SimpleNamespace(user_id=voter_ids[index]))
+            return True
+        except Exception:
+            return False
+        finally:
+            session.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(cast, range(len(voter_ids))))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "ballots": sum(results),
+        "errors": len(results) - sum(results),
+        "seconds": round(elapsed, 3),
+        "ballots_per_sec": round(sum(results) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--voters", type=int, default=2000)
+    parser.add_argument("--candidates", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    # app.db.database reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    from app.db.database import Base, engine
+    from app.db import models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    report = [_run(mode, args.voters, args.candidates, args.concurrency)
+              for mode in ("per_request", "group_commit")]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
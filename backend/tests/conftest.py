@@ -0,0 +1,66 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Read when the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["FACE_WORKERS"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.token import create_access_token  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import tally_service  # noqa: E402
+
+ADMIN_ID = "ADMIN0"
+VOTER_IDS = [f"VOTER{i}" for i in range(5)]
+CANDIDATE_IDS = [f"CAND0{i}" for i in range(4)]
+ACTIVE_ELECTION = "ELECTION-ACTIVE"
+ENDED_ELECTION = "ELECTION-ENDED"
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    db = SessionLocal()
+    try:
+        db.add(models.User(user_id=ADMIN_ID, email="admin@test.example.com", full_name="Admin",
+                           hashed_password="-", role="admin"))
+        for user_id in VOTER_IDS:
+            db.add(models.User(user_id=user_id, email=f"{user_id.lower()}@test.example.com", full_name=user_id,
+                               hashed_password="-", role="voter"))
+        for candidate_id in CANDIDATE_IDS:
+            db.add(models.Candidate(candidate_id=candidate_id, name=candidate_id, party="Test", manifesto="-"))
+
+        now = datetime.utcnow()
+        for election_id, status in ((ACTIVE_ELECTION, models.ElectionStatus.ACTIVE),
+                                    (ENDED_ELECTION, models.ElectionStatus.COMPLETED)):
+            db.add(models.Election(election_id=election_id, title=election_id, description="-",
+                                   start_date=now, end_date=now + timedelta(days=1), status=status))
+            for candidate_id in CANDIDATE_IDS:
+                db.add(models.ElectionCandidate(election_id=election_id, candidate_id=candidate_id))
+                tally_service.create_tallies(db, election_id, candidate_id)
+
+        # Ended without a snapshot, like elections that closed before snapshots existed
+        for index, voter_id in enumerate(VOTER_IDS):
+            db.add(models.Vote(vote_id=f"V{index}", election_id=ENDED_ELECTION, voter_id=voter_id,
+                               candidate_id=CANDIDATE_IDS[index % 2], timestamp=now))
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="session")
+def client(seeded):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth():
+    def headers(user_id: str = VOTER_IDS[0]) -> dict:
+        return {"Authorization": f"Bearer {create_access_token({'sub': user_id})}"}
+    return headers
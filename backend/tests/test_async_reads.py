@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import event
+
+from app.api.v1.endpoints import elections
+from app.db.database import engine
+from app.db.query_counter import QueryBudgetExceeded
+
+from conftest import ACTIVE_ELECTION, ENDED_ELECTION, VOTER_IDS
+
+ASYNC_URLS = [
+    "/api/v1/elections/",
+    f"/api/v1/elections/{ACTIVE_ELECTION}",
+    f"/api/v1/elections/{ACTIVE_ELECTION}/candidates",
+    f"/api/v1/elections/{ENDED_ELECTION}/vote-status",
+    "/api/v1/candidates/",
+    "/api/v1/users/",
+    "/api/v1/auth/me",
+    "/api/v1/auth/face-status",
+]
+
+
+@pytest.mark.parametrize("url", ASYNC_URLS)
+def test_async_reads_never_check_out_a_sync_connection(client, auth, url):
+    checkouts = []
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.append(connection_record)
+
+    event.listen(engine, "checkout", on_checkout)
+    try:
+        response = client.get(url, headers=auth(VOTER_IDS[1]))
+    finally:
+        event.remove(engine, "checkout", on_checkout)
+    assert response.status_code == 200
+    assert checkouts == []
+
+
+def test_async_statements_count_against_the_budget(client, auth, monkeypatch):
+    monkeypatch.setenv("SQL_BUDGET_STRICT", "true")
+    monkeypatch.setattr(elections.check_vote_status, "__sql_budget__", 0)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(f"/api/v1/elections/{ENDED_ELECTION}/vote-status", headers=auth())
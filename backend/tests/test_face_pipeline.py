@@ -0,0 +1,39 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services import face_pipeline
+from benchmarks.face_accuracy import _full_resolution
+
+# NASA portrait of Eileen Collins (public domain), as shipped with scikit-image
+FACE_IMAGE = os.path.join(os.path.dirname(__file__), "fixtures", "face.jpg")
+# Compared with the 0.6 match tolerance, leaving room for every login decision to stay the same
+MAX_DRIFT = 0.1
+
+
+def _photo(long_side: int) -> bytes:
+    image = Image.open(FACE_IMAGE)
+    image = image.resize((long_side, long_side), Image.BICUBIC)
+    data = io.BytesIO()
+    image.save(data, "JPEG", quality=92)
+    return data.getvalue()
+
+
+@pytest.mark.parametrize("long_side", [
+    512,
+    # Detected on a downscaled copy
+    1200,
+    # Also decoded down to the working resolution
+    2400,
+])
+def test_pipeline_encoding_matches_full_resolution(long_side):
+    data = _photo(long_side)
+    options = face_pipeline.PROFILES["login"]
+    full = _full_resolution(io.BytesIO(data), options)
+    encoding, _ = face_pipeline.process_image_bytes(data, options)
+
+    assert full is not None and encoding is not None
+    assert float(np.linalg.norm(full - encoding)) < MAX_DRIFT
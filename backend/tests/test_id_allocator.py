@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from app.db import models
+from app.db.database import SessionLocal
+from app.services.id_allocator import BlockAllocator
+
+# Every connection of the default pool: 5 plus 10 overflow
+HOLDERS = 15
+
+
+def test_lease_needs_no_second_connection(seeded):
+    allocator = BlockAllocator("test-pool", models.User.user_id, block_size=4)
+    # Every request holds its connection by the time the free list runs dry
+    barrier = threading.Barrier(HOLDERS)
+
+    def allocate(_) -> list[str]:
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT 1"))
+            barrier.wait(timeout=10)
+            ids = allocator.take(db, 2)
+            db.commit()
+            return ids
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=HOLDERS) as pool:
+        taken = [new_id for ids in pool.map(allocate, range(HOLDERS), timeout=20) for new_id in ids]
+    assert len(set(taken)) == HOLDERS * 2
+
+
+def test_rolled_back_lease_is_not_shared(seeded):
+    allocator = BlockAllocator("test-rollback", models.User.user_id, block_size=4)
+    db = SessionLocal()
+    try:
+        allocator.take(db, 1)
+        db.rollback()
+        assert allocator._free == []
+
+        allocator.take(db, 1)
+        db.commit()
+        assert len(allocator._free) == 3
+    finally:
+        db.close()
@@ -0,0 +1,76 @@
+import pytest
+
+from app.api.v1.endpoints import elections
+from app.db.query_counter import QueryBudgetExceeded
+from app.utils import pagination
+
+from conftest import ACTIVE_ELECTION, CANDIDATE_IDS, ENDED_ELECTION
+
+
+@pytest.fixture(autouse=True)
+def strict_budgets(monkeypatch):
+    monkeypatch.setenv("SQL_BUDGET_STRICT", "true")
+
+
+LIST_URLS = [
+    "/api/v1/elections/",
+    f"/api/v1/elections/{ACTIVE_ELECTION}",
+    f"/api/v1/elections/{ACTIVE_ELECTION}/candidates",
+    "/api/v1/candidates/",
+    "/api/v1/users/",
+]
+
+
+@pytest.mark.parametrize("url", LIST_URLS)
+def test_list_endpoints_stay_within_budget(client, auth, url):
+    # Cold, then served from the read cache
+    for _ in range(2):
+        response = client.get(url, headers=auth())
+        assert response.status_code == 200
+
+
+@pytest.mark.parametrize("url", ["/api/v1/elections/", "/api/v1/candidates/", "/api/v1/users/"])
+def test_every_page_stays_within_budget(client, auth, url):
+    cursor = None
+    seen = 0
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, headers=auth(), params=params)
+        assert response.status_code == 200
+        seen += len(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen > 1
+
+
+@pytest.mark.parametrize("url", ["/api/v1/elections/", "/api/v1/candidates/", "/api/v1/users/"])
+def test_lists_are_unpaged_without_limit_or_cursor(client, auth, monkeypatch, url):
+    monkeypatch.setattr(pagination, "PAGE_SIZE_DEFAULT", 1)
+    response = client.get(url, headers=auth())
+    assert response.status_code == 200
+    assert len(response.json()) > 1
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_tampered_cursor_is_rejected(client, auth):
+    # base64 of [{}]: valid JSON, wrong key type
+    response = client.get("/api/v1/candidates/", headers=auth(), params={"cursor": "W3t9XQ"})
+    assert response.status_code == 400
+
+
+def test_results_within_budget_before_and_after_snapshot(client, auth):
+    url = f"/api/v1/elections/{ENDED_ELECTION}/results"
+    first = client.get(url, headers=auth())
+    assert first.status_code == 200
+    assert first.json()["turnout"] == 5
+    assert first.json()["winner"]["name"] == CANDIDATE_IDS[0]
+
+    second = client.get(url, headers=auth())
+    assert second.json() == first.json()
+
+
+def test_strict_mode_raises_over_budget(client, auth, monkeypatch):
+    monkeypatch.setattr(elections.get_election_candidates, "__sql_budget__", 0)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(f"/api/v1/elections/{ACTIVE_ELECTION}/candidates", headers=auth())
@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.db import models
+from app.db.database import SessionLocal
+from app.services import tally_service, vote_ingest, vote_token_service
+
+from conftest import ACTIVE_ELECTION, CANDIDATE_IDS, VOTER_IDS
+
+ELECTION = "ELECTION-GROUP"
+# More than the 5 connections plus 10 overflow of the default pool
+BALLOTS = 24
+
+
+def _seed_voters(count: int) -> list[str]:
+    voter_ids = [f"GC{i:04d}" for i in range(count)]
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.add(models.Election(election_id=ELECTION, title=ELECTION, description="-", start_date=now,
+                               end_date=now + timedelta(days=1), status=models.ElectionStatus.ACTIVE))
+        for candidate_id in CANDIDATE_IDS:
+            db.add(models.ElectionCandidate(election_id=ELECTION, candidate_id=candidate_id))
+            tally_service.create_tallies(db, ELECTION, candidate_id)
+        for voter_id in voter_ids:
+            db.add(models.User(user_id=voter_id, email=f"{voter_id.lower()}@test.example.com",
+                               full_name=voter_id, hashed_password="-", role="voter"))
+        db.commit()
+    finally:
+        db.close()
+    return voter_ids
+
+
+def test_group_commit_survives_more_ballots_than_connections(client, auth, monkeypatch):
+    voter_ids = _seed_voters(BALLOTS)
+    # A long linger lets every request reach the queue before the writer needs a connection
+    monkeypatch.setattr(vote_ingest, "batcher", vote_ingest.VoteBatcher(max_size=BALLOTS, linger_ms=500))
+
+    def cast(voter_id: str) -> int:
+        vote_token, _ = vote_token_service.issue(voter_id, ELECTION)
+        response = client.post(f"/api/v1/elections/{ELECTION}/vote", headers=auth(voter_id), json={
+            "candidate_id": CANDIDATE_IDS[0],
+            "vote_token": vote_token,
+        })
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=BALLOTS) as threads:
+        futures = [threads.submit(cast, voter_id) for voter_id in voter_ids]
+        # Well under the 30 s pool timeout a starved writer would wait out
+        statuses = [future.result(timeout=20) for future in futures]
+
+    assert statuses == [200] * BALLOTS
+    db = SessionLocal()
+    try:
+        assert tally_service.get_vote_counts(db, ELECTION)[CANDIDATE_IDS[0]] == BALLOTS
+    finally:
+        db.close()
+
+
+def test_ballot_without_vote_token_is_refused(client, auth):
+    response = client.post(f"/api/v1/elections/{ACTIVE_ELECTION}/vote", headers=auth(VOTER_IDS[0]),
+                           json={"candidate_id": CANDIDATE_IDS[0]})
+
+    assert response.status_code == 403
+    db = SessionLocal()
+    try:
+        assert not db.query(models.Vote).filter_by(election_id=ACTIVE_ELECTION).count()
+    finally:
+        db.close()
@@ -4,18 +4,19 @@ import { faceService } from '../../services/face';
 import { WebcamComponent } from '../ui/Webcam';
 
 interface FaceVerificationModalProps {
+  electionId: string;
   onClose: () => void;
-  onVerified: () => void;
+  onVerified: (voteToken: string) => void;
 }
 
-export function FaceVerificationModal({ onClose, onVerified }: FaceVerificationModalProps) {
+export function FaceVerificationModal({ electionId, onClose, onVerified }: FaceVerificationModalProps) {
   const [error, setError] = useState<string | null>(null);
 
   const handleCapture = async (image: File) => {
     try {
       setError(null);
-      await faceService.verifyFace(image);
-      onVerified();
+      const voteToken = await faceService.verifyFace(image, electionId);
+      onVerified(voteToken);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Face verification failed. Please try again.');
       console.error('Face verification error:', err);
@@ -3,12 +3,10 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { electionService, Election } from '../services/election';
 import { FaceVerificationModal } from '../components/FaceVerificationModal/index';
-import { useAuth } from '../contexts/AuthContext';
 
 export function ElectionPage() {
   const { electionId } = useParams<{ electionId: string }>();
   const navigate = useNavigate();
-  const { authType } = useAuth();
   const [election, setElection] = useState<Election | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
@@ -42,32 +40,21 @@ export function ElectionPage() {
     fetchElection();
   }, [electionId]);
 
-  const handleVote = async (candidateId: string) => {
+  const handleVote = (candidateId: string) => {
     if (hasVoted) {
       setError('You have already voted in this election');
       return;
     }
 
     setSelectedCandidate(candidateId);
-    
-    if (authType === 'password') {
-      setShowVerification(true);
-    } else {
-      try {
-        if (!electionId) return;
-        await electionService.castVote(electionId, candidateId);
-        setHasVoted(true);
-        navigate('/dashboard');
-      } catch (err) {
-        setError('Failed to cast vote');
-      }
-    }
+    // Every ballot carries the vote token of a fresh face verification
+    setShowVerification(true);
   };
 
-  const handleVerificationSuccess = async () => {
+  const handleVerificationSuccess = async (voteToken: string) => {
     try {
       if (!electionId || !selectedCandidate) return;
-      await electionService.castVote(electionId, selectedCandidate);
+      await electionService.castVote(electionId, selectedCandidate, voteToken);
       setHasVoted(true);
       navigate('/dashboard');
     } catch (err) {
@@ -180,8 +167,9 @@ export function ElectionPage() {
         </div>
       </div>
 
-      {showVerification && (
+      {showVerification && electionId && (
         <FaceVerificationModal
+          electionId={electionId}
           onClose={() => setShowVerification(false)}
           onVerified={handleVerificationSuccess}
         />
@@ -2,13 +2,11 @@ import { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { electionService, Election } from '../services/election';
-import { useAuth } from '../contexts/AuthContext';
 import { FaceVerificationModal } from '../components/FaceVerificationModal/index';
 
 export function VotePage() {
   const { electionId } = useParams();
   const navigate = useNavigate();
-  const { authType } = useAuth();
   const [election, setElection] = useState<Election | null>(null);
   const [selectedCandidate, setSelectedCandidate] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
@@ -47,42 +45,19 @@ export function VotePage() {
     fetchElection();
   }, [electionId, navigate]);
 
-  const handleVote = async () => {
+  const handleVote = () => {
     if (!electionId || !selectedCandidate) return;
 
-    // If user logged in with password, show face verification
-    if (authType === 'password') {
-      setShowVerification(true);
-      return;
-    }
-
-    // If user logged in with face, proceed with voting
-    setIsLoading(true);
-    setError(null);
-    try {
-      await electionService.castVote(electionId, selectedCandidate);
-      setSuccess(true);
-      setShowSuccessModal(true);
-    } catch (err: any) {
-      if (err.response?.status === 401) {
-        setError('Please log in to vote');
-        setTimeout(() => navigate('/'), 2000);
-      } else if (err.response?.status === 400) {
-        setError(err.response.data.detail || 'You have already voted in this election');
-      } else {
-        setError('Failed to cast vote. Please try again.');
-      }
-    } finally {
-      setIsLoading(false);
-    }
+    // Every ballot carries the vote token of a fresh face verification
+    setShowVerification(true);
   };
 
-  const handleVerificationSuccess = async () => {
+  const handleVerificationSuccess = async (voteToken: string) => {
     setIsLoading(true);
     setError(null);
     try {
       if (!electionId || !selectedCandidate) return;
-      await electionService.castVote(electionId, selectedCandidate);
+      await electionService.castVote(electionId, selectedCandidate, voteToken);
       setSuccess(true);
       setShowSuccessModal(true);
     } catch (err: any) {
@@ -209,8 +184,9 @@ export function VotePage() {
         </div>
       </div>
 
-      {showVerification && (
+      {showVerification && electionId && (
         <FaceVerificationModal
+          electionId={electionId}
           onClose={() => setShowVerification(false)}
           onVerified={handleVerificationSuccess}
         />
@@ -77,8 +77,8 @@ export class ElectionService {
     await api.delete(`/elections/${electionId}/candidates/${candidateId}`);
   }
 
-  async castVote(electionId: string, candidateId: string): Promise<void> {
-    await api.post(`/elections/${electionId}/vote`, { candidate_id: candidateId });
+  async castVote(electionId: string, candidateId: string, voteToken: string): Promise<void> {
+    await api.post(`/elections/${electionId}/vote`, { candidate_id: candidateId, vote_token: voteToken });
   }
 
   async getElectionResults(electionId: string) {
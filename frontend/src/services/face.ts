@@ -5,6 +5,13 @@ export interface FaceStatus {
   user_id: string;
 }
 
+export interface FaceVerificationResult {
+  message: string;
+  vote_token: string;
+  expires_at: string;
+  election_id: string;
+}
+
 class FaceService {
   async registerFace(image: string | File, email?: string, fullName?: string, password?: string, role?: string): Promise<void> {
     if (typeof image === 'string') {
@@ -32,26 +39,27 @@ class FaceService {
     });
   }
 
-  async verifyFace(image: string | File): Promise<void> {
+  async verifyFace(image: string | File, electionId: string): Promise<string> {
     if (typeof image === 'string') {
       // Convert base64 to blob
       const response = await fetch(image);
       const blob = await response.blob();
       const file = new File([blob], 'face.jpg', { type: 'image/jpeg' });
-      await this.uploadVerification(file);
-    } else {
-      await this.uploadVerification(image);
+      return this.uploadVerification(file, electionId);
     }
+    return this.uploadVerification(image, electionId);
   }
 
-  private async uploadVerification(file: File): Promise<void> {
+  private async uploadVerification(file: File, electionId: string): Promise<string> {
     const formData = new FormData();
     formData.append('image', file);
-    await api.post('/auth/face/verify', formData, {
+    formData.append('election_id', electionId);
+    const response = await api.post<FaceVerificationResult>('/auth/face/verify', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
     });
+    return response.data.vote_token;
   }
 
   async getFaceStatus(): Promise<FaceStatus> {